@@ -1,15 +1,18 @@
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .settings import settings
 from .models import User, Role
-from .db import get_session
+from .db import get_async_session
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2 = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -20,9 +23,13 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
 
-def create_access_token(sub: str) -> str:
-    exp = datetime.utcnow() + timedelta(minutes=settings.jwt_exp_minutes)
-    payload = {"sub": sub, "exp": exp}
+def create_access_token(sub: str, role: Optional[str] = None) -> str:
+    now = datetime.utcnow()
+    exp = now + timedelta(minutes=settings.jwt_exp_minutes)
+    payload = {"sub": sub, "exp": exp, "iat": now}
+    if role:
+        # Nama role ikut di claim: request terautentikasi tidak perlu lookup tabel roles
+        payload["role"] = role
     return jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_alg)
 
 def get_user_by_username(session: Session, username: str) -> Optional[User]:
@@ -31,9 +38,60 @@ def get_user_by_username(session: Session, username: str) -> Optional[User]:
 def get_role_by_name(session: Session, name: str) -> Optional[Role]:
     return session.exec(select(Role).where(Role.name == name)).first()
 
-def get_current_user(
+# Principal cache: token -> (kedaluwarsa monotonic, user, nama role).
+# Polling dashboard yang sama tidak meng-query users/roles setiap request;
+# entri user dibuang saat user diubah/dinonaktifkan (invalidate_principal).
+_principals: Dict[str, Tuple[float, User, str]] = {}
+_principals_lock = threading.Lock()
+_PRINCIPALS_MAX = 1024
+
+def invalidate_principal(username: Optional[str] = None):
+    """Buang principal ter-cache milik `username` (None = semua)"""
+    with _principals_lock:
+        for token in [t for t, (_, u, _) in _principals.items() if username is None or u.username == username]:
+            del _principals[token]
+
+def _cache_principal(token: str, user: User, role_name: str, exp: Optional[float]):
+    if settings.auth_cache_ttl_seconds <= 0:
+        return
+    now = time.monotonic()
+    ttl = settings.auth_cache_ttl_seconds
+    if exp is not None:
+        # Entri tidak boleh hidup melewati claim exp token (epoch -> monotonic)
+        ttl = min(ttl, exp - time.time())
+        if ttl <= 0:
+            return
+    with _principals_lock:
+        if len(_principals) >= _PRINCIPALS_MAX:
+            for t in [t for t, (expires, _, _) in _principals.items() if expires <= now]:
+                del _principals[t]
+            if len(_principals) >= _PRINCIPALS_MAX:
+                _principals.clear()
+        _principals[token] = (now + ttl, user, role_name)
+
+async def get_principal(
+    token: str = Depends(oauth2),
+    session: AsyncSession = Depends(get_async_session),
+) -> Tuple[User, str]:
+    """(user, nama role) untuk token; dari cache jika masih berlaku"""
+    cached = _principals.get(token)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1], cached[2]
+
+    user = await get_current_user(token, session)
+    payload = jwt.get_unverified_claims(token)  # sudah diverifikasi oleh get_current_user
+    role_name = payload.get("role")
+    issued_at = payload.get("iat")
+    # Claim role hanya dipercaya jika user tidak diubah setelah token dibuat
+    if not role_name or issued_at is None or user.updated_at > datetime.utcfromtimestamp(issued_at):
+        role = await session.get(Role, user.role_id)
+        role_name = role.name if role else ""
+    _cache_principal(token, user, role_name, payload.get("exp"))
+    return user, role_name
+
+async def get_current_user(
     token: str = Depends(oauth2),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> User:
     try:
         payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_alg])
@@ -43,7 +101,7 @@ def get_current_user(
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    user = get_user_by_username(session, username)
+    user = (await session.exec(select(User).where(User.username == username))).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     if not user.is_active:
@@ -52,10 +110,10 @@ def get_current_user(
 
 def require_role(*roles: str):
     """Dependency to check user role"""
-    def dep(user: User = Depends(get_current_user), session: Session = Depends(get_session)) -> User:
-        # Get role name from role_id
-        role = session.get(Role, user.role_id)
-        if not role or role.name.upper() not in [r.upper() for r in roles]:
+    allowed = {r.upper() for r in roles}
+    async def dep(principal: Tuple[User, str] = Depends(get_principal)) -> User:
+        user, role_name = principal
+        if role_name.upper() not in allowed:
             raise HTTPException(status_code=403, detail="Forbidden")
         return user
     return dep
@@ -1,20 +1,153 @@
+import asyncio
+
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from .settings import settings
 
+_is_sqlite = settings.database_url.startswith("sqlite")
+_is_memory = _is_sqlite and (":memory:" in settings.database_url or settings.database_url.rstrip("/") == "sqlite:")
+
 # SQLite specific: check_same_thread=False for FastAPI async
-connect_args = {"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
+connect_args = {"check_same_thread": False} if _is_sqlite else {}
 
 engine = create_engine(
     settings.database_url, 
     connect_args=connect_args,
-    echo=settings.app_env == "dev"  # Log SQL in dev mode
+    echo=settings.sql_echo,
+    # :memory: = satu database per koneksi; semua thread harus memakai koneksi yang sama
+    **({"poolclass": StaticPool} if _is_memory else {})
 )
 
+def _sqlite_pragmas(read_only: bool):
+    """
+    Pragma per koneksi untuk profil SQLite tuned:
+    - journal_mode=WAL: pembaca tidak memblokir penulis dan sebaliknya
+    - synchronous=NORMAL: aman di WAL (commit terakhir bisa hilang saat listrik mati, DB tidak korup)
+    - cache_size / mmap_size: page cache dan memory-mapped I/O lebih besar
+    - busy_timeout: tunggu write lock alih-alih langsung "database is locked"
+    """
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA cache_size=-{settings.sqlite_cache_mb * 1024}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_mb * 1024 * 1024}",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+
+    def on_connect(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return on_connect
+
+# Engine untuk GET endpoint: pool koneksi query_only terpisah, sehingga
+# dashboard membaca snapshot WAL tanpa antre di belakang writer ingest
+read_engine = engine
+if _is_sqlite and settings.sqlite_tuned and not _is_memory:
+    event.listen(engine, "connect", _sqlite_pragmas(read_only=False))
+    read_engine = create_engine(
+        settings.database_url,
+        connect_args=connect_args,
+        echo=settings.sql_echo,
+        pool_size=settings.sqlite_read_pool_size,
+        max_overflow=settings.sqlite_read_pool_size
+    )
+    event.listen(read_engine, "connect", _sqlite_pragmas(read_only=True))
+
+# Engine async (aiosqlite) untuk endpoint baca yang panas (stats, laporan, auth):
+# request menunggu DB di event loop, bukan memegang worker thread pool.
+# Hanya untuk file SQLite: :memory: di koneksi aiosqlite adalah database kosong
+# lain, dan URL non-SQLite tidak punya driver async di requirements — keduanya
+# memakai read_engine sinkron lewat thread (lihat get_async_session).
+async_read_engine = None
+if _is_sqlite and not _is_memory:
+    async_read_engine = create_async_engine(
+        settings.database_url.replace("sqlite://", "sqlite+aiosqlite://", 1),
+        echo=settings.sql_echo,
+        pool_size=settings.sqlite_read_pool_size,
+        max_overflow=settings.sqlite_read_pool_size
+    )
+    if settings.sqlite_tuned:
+        event.listen(async_read_engine.sync_engine, "connect", _sqlite_pragmas(read_only=True))
+
+# Kolom/index yang ditambahkan setelah tabel dibuat; create_all tidak mengubah tabel lama
+_ADDED_COLUMNS = {
+    "visit_events": [
+        ("client_event_id", "VARCHAR(64)"),
+        ("is_new_unique", "BOOLEAN NOT NULL DEFAULT 0"),
+    ],
+    "stats_checkpoint": [
+        ("last_flush_at", "DATETIME"),
+    ],
+}
+# Isi kolom baru untuk baris lama, dijalankan sekali saat kolom ditambahkan.
+# is_new_unique: event pertama yang di-ingest per (tanggal, visitor_key) — sama
+# dengan event yang dulu membuat baris visitor_daily — supaya recompute stats
+# dari visit_events tidak mengenolkan unique_visitors database lama.
+_BACKFILLS = {
+    ("visit_events", "is_new_unique"): """
+        UPDATE visit_events SET is_new_unique = 1
+        WHERE event_id IN (SELECT MIN(event_id) FROM visit_events GROUP BY date(event_time), visitor_key)
+    """,
+}
+_ADDED_INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_visit_events_client_event_id ON visit_events (client_event_id)",
+]
+
 def init_db() -> None:
     """Initialize database tables"""
     SQLModel.metadata.create_all(engine)
+    if _is_sqlite:
+        _migrate_sqlite()
+
+def _migrate_sqlite() -> None:
+    """Tambahkan kolom/index baru ke database SQLite yang sudah ada"""
+    with engine.begin() as conn:
+        for table, columns in _ADDED_COLUMNS.items():
+            existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+            for name, ddl in columns:
+                if name not in existing:
+                    conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+                    if (table, name) in _BACKFILLS:
+                        conn.exec_driver_sql(_BACKFILLS[(table, name)])
+        for ddl in _ADDED_INDEXES:
+            conn.exec_driver_sql(ddl)
 
 def get_session():
     """Get database session for dependency injection"""
     with Session(engine) as session:
         yield session
+
+def get_read_session():
+    """Session read-only (pool terpisah) untuk endpoint GET"""
+    with Session(read_engine) as session:
+        yield session
+
+class ThreadedSession:
+    """Session sinkron dengan antarmuka AsyncSession (exec/get) yang berjalan di thread"""
+
+    def __init__(self, session: Session):
+        self._session = session
+
+    async def exec(self, statement):
+        return await asyncio.to_thread(self._session.exec, statement)
+
+    async def get(self, entity, ident):
+        return await asyncio.to_thread(self._session.get, entity, ident)
+
+
+async def get_async_session():
+    """AsyncSession read-only (aiosqlite) untuk endpoint async; tanpa engine async: session sinkron di thread"""
+    if async_read_engine is None:
+        with Session(read_engine, expire_on_commit=False) as session:
+            yield ThreadedSession(session)
+        return
+    async with AsyncSession(async_read_engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,81 @@
+"""
+Konfigurasi edge worker (kamera + counting areas) dengan versi/ETag.
+
+Edge worker dulu mengambil /api/cameras/{id} dan /api/cameras/{id}/areas
+setiap 30 detik, dan backend meng-query + serialize ulang setiap kali.
+Sekarang config per kamera di-cache di memori beserta versinya (hash isi),
+dan cache dibuang hanya saat admin mengubah kamera/area (`invalidate`).
+Edge mengirim If-None-Match dan mendapat 304 selama versi tidak berubah,
+atau berlangganan SSE untuk menerima config baru saat ada perubahan.
+"""
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from .models import Camera, CountingArea
+
+_lock = threading.Lock()
+# camera_id -> (generation, version, payload)
+_cache: Dict[int, Tuple[int, str, Dict[str, Any]]] = {}
+# camera_id -> generation; naik setiap config kamera berubah
+_generation: Dict[int, int] = {}
+
+
+def generation(camera_id: int) -> int:
+    """Nomor perubahan config kamera di proses ini (murah, tanpa query DB)"""
+    return _generation.get(camera_id, 0)
+
+
+def invalidate(camera_id: Optional[int] = None):
+    """Buang cache config kamera (None = semua) setelah kamera/area diubah"""
+    with _lock:
+        camera_ids = list(_cache) + list(_generation) if camera_id is None else [camera_id]
+        for cid in set(camera_ids):
+            _cache.pop(cid, None)
+            _generation[cid] = _generation.get(cid, 0) + 1
+
+
+def get_edge_config(session: Session, camera_id: int) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Config kamera untuk edge: (version, payload), atau None jika kamera tidak ada.
+    Di-cache sampai `invalidate(camera_id)`.
+    """
+    gen = generation(camera_id)
+    cached = _cache.get(camera_id)
+    if cached is not None and cached[0] == gen:
+        return cached[1], cached[2]
+
+    cam = session.get(Camera, camera_id)
+    if not cam:
+        return None
+    areas = session.exec(select(CountingArea).where(CountingArea.camera_id == camera_id)).all()
+    config = {
+        "camera": {
+            "camera_id": cam.camera_id,
+            "name": cam.name,
+            "location": cam.location,
+            "stream_url": cam.stream_url,
+            "is_active": cam.is_active,
+        },
+        "areas": [
+            {
+                "area_id": a.area_id,
+                "camera_id": a.camera_id,
+                "name": a.name,
+                "roi_polygon": a.roi_polygon,
+                "direction_mode": a.direction_mode,
+                "is_active": a.is_active,
+            }
+            for a in areas
+        ],
+    }
+    # Versi = hash isi, sehingga tetap sama setelah backend restart
+    version = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    payload = {"camera_id": camera_id, "version": version, **config}
+    with _lock:
+        if generation(camera_id) == gen:
+            _cache[camera_id] = (gen, version, payload)
+    return version, payload
@@ -0,0 +1,130 @@
+"""
+Logika ingest event kunjungan dari edge worker.
+
+Dipakai oleh /api/events/ingest (satu event) dan /api/events/ingest/batch
+(banyak event, satu transaksi). Setiap event ditulis dengan dua statement,
+tanpa SELECT terlebih dahulu:
+
+1. INSERT visit_events ... ON CONFLICT (client_event_id) DO NOTHING
+   RETURNING — is_new_unique dihitung di dalam statement yang sama
+   (NOT EXISTS visitor_daily untuk tanggal + visitor_key tersebut).
+   Statement pertama adalah write, sehingga SQLite sudah memegang write lock
+   saat keputusan "pengunjung baru" diambil: dua request paralel tidak bisa
+   sama-sama menganggap visitor yang sama sebagai baru.
+2. INSERT visitor_daily ... ON CONFLICT (visit_date, visitor_key) DO UPDATE
+   last_seen_at.
+
+daily_stats dan rollup per jam / 5 menit tidak ditulis di sini: apply_events
+mengembalikan delta-nya, dan pemanggil menyerahkannya ke StatsAggregator
+(app/stats_buffer.py) setelah commit.
+Area default per kamera di-cache di proses dan dibuang bersama cache
+edge_config setiap kali kamera/area diubah.
+
+Event boleh membawa `client_event_id` (idempotency key dari edge). Event
+yang id-nya sudah pernah di-ingest tidak diterapkan lagi; hasil aslinya
+(is_new_unique) dikembalikan dengan duplicate=True, sehingga retry dan
+replay outbox aman.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Sequence, Tuple
+
+from sqlalchemy import Date, DateTime, bindparam, text
+from sqlmodel import Session, select
+
+from . import edge_config
+from .models import CountingArea
+from .stats_buffer import StatsDelta, StatsKey, event_deltas
+
+# SQL ditulis sekali di sini: insert ON CONFLICT tidak masuk compiled cache
+# SQLAlchemy, sehingga membangunnya per event lewat insert().on_conflict_*()
+# berarti kompilasi ulang setiap statement. text() di-compile sekali.
+_INSERT_EVENT = text("""
+    INSERT INTO visit_events (camera_id, area_id, event_time, track_id, visitor_key, direction,
+                              confidence_avg, client_event_id, is_new_unique, created_at)
+    VALUES (:camera_id, :area_id, :event_time, :track_id, :visitor_key, :direction,
+            :confidence_avg, :client_event_id,
+            NOT EXISTS (SELECT 1 FROM visitor_daily WHERE visit_date = :visit_date AND visitor_key = :visitor_key),
+            :now)
+    ON CONFLICT (client_event_id) DO NOTHING
+    RETURNING is_new_unique
+""").bindparams(
+    bindparam("event_time", type_=DateTime), bindparam("visit_date", type_=Date), bindparam("now", type_=DateTime)
+)
+_SELECT_EVENT_RESULT = text("SELECT is_new_unique FROM visit_events WHERE client_event_id = :client_event_id")
+# last_seen_at tidak pernah mundur (event dari outbox bisa datang tidak urut)
+_UPSERT_VISITOR = text("""
+    INSERT INTO visitor_daily (visit_date, visitor_key, first_seen_at, last_seen_at)
+    VALUES (:visit_date, :visitor_key, :event_time, :event_time)
+    ON CONFLICT (visit_date, visitor_key) DO UPDATE
+    SET last_seen_at = MAX(last_seen_at, excluded.last_seen_at)
+""").bindparams(bindparam("visit_date", type_=Date), bindparam("event_time", type_=DateTime))
+# camera_id -> (edge_config.generation, area_id)
+_default_areas: Dict[int, Tuple[int, int]] = {}
+
+
+def default_area_id(session: Session, camera_id: int) -> int:
+    """Area aktif pertama kamera (fallback 1), di-cache sampai config kamera berubah"""
+    gen = edge_config.generation(camera_id)
+    cached = _default_areas.get(camera_id)
+    if cached is not None and cached[0] == gen:
+        return cached[1]
+    area = session.exec(
+        select(CountingArea).where(CountingArea.camera_id == camera_id, CountingArea.is_active == True)
+    ).first()
+    area_id = area.area_id if area else 1
+    _default_areas[camera_id] = (gen, area_id)
+    return area_id
+
+
+def apply_events(session: Session, events: Sequence[Any]) -> Tuple[List[Dict[str, bool]], Dict[StatsKey, StatsDelta]]:
+    """
+    Terapkan event (EventIn) ke session tanpa commit.
+    Returns ({"is_new_unique", "duplicate"} per event urut sesuai input,
+    delta statistik per rollup — lihat stats_buffer.event_deltas).
+
+    Logika pengunjung unik harian:
+    - (visit_date, visitor_key) belum ada di visitor_daily → unik bertambah
+    - Sudah ada → update last_seen_at saja (unik tidak bertambah)
+    """
+    results: List[Dict[str, bool]] = []
+    stats: Dict[StatsKey, StatsDelta] = {}
+    seen: Dict[str, bool] = {}
+    now = datetime.utcnow()
+
+    for e in events:
+        if e.client_event_id in seen:
+            # Duplikat di dalam batch ini
+            results.append({"is_new_unique": seen[e.client_event_id], "duplicate": True})
+            continue
+
+        params = {
+            "camera_id": e.camera_id,
+            "area_id": e.area_id or default_area_id(session, e.camera_id),
+            "event_time": e.event_time,
+            "visit_date": e.event_time.date(),
+            "track_id": e.track_id,
+            "visitor_key": e.visitor_key,
+            "direction": e.direction,
+            "confidence_avg": e.confidence_avg,
+            "client_event_id": e.client_event_id,
+            "now": now,
+        }
+        is_new_unique = session.execute(_INSERT_EVENT, params).scalar_one_or_none()
+        if is_new_unique is None:
+            # Sudah di-ingest sebelumnya: kembalikan hasil asli, tanpa efek
+            is_new_unique = bool(session.execute(
+                _SELECT_EVENT_RESULT, {"client_event_id": e.client_event_id}
+            ).scalar_one())
+            seen[e.client_event_id] = is_new_unique
+            results.append({"is_new_unique": is_new_unique, "duplicate": True})
+            continue
+
+        is_new_unique = bool(is_new_unique)
+        session.execute(_UPSERT_VISITOR, params)
+
+        event_deltas(stats, e.event_time, e.camera_id, params["area_id"], e.direction, is_new_unique)
+        if e.client_event_id:
+            seen[e.client_event_id] = is_new_unique
+        results.append({"is_new_unique": is_new_unique, "duplicate": False})
+
+    return results, stats
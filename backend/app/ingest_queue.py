@@ -0,0 +1,181 @@
+"""
+Single-writer ingest queue untuk SQLite.
+
+SQLite hanya punya satu write lock. Jika setiap request ingest menulis dari
+thread pool FastAPI sendiri-sendiri, thread saling berebut lock ("database
+is locked", busy retry) dan throughput turun justru saat beban naik. Sekarang
+endpoint hanya memasukkan event yang sudah divalidasi ke antrean; satu thread
+writer mengambil semua request yang menunggu — yaitu yang datang selama
+commit sebelumnya, plus yang datang dalam INGEST_LINGER_MS jika diset —
+menerapkannya dalam satu transaksi (group commit), lalu
+menyelesaikan Future tiap request dengan hasilnya masing-masing.
+Setelah commit, delta statistik diserahkan ke StatsAggregator dan event
+IN/OUT ke OccupancyTracker.
+
+Jika transaksi satu grup gagal, request di grup itu diulang satu per satu
+sehingga hanya request yang bermasalah yang menerima error. Pekerjaan setelah
+commit (stats, okupansi, hasil Future) tidak pernah memicu retry, dan request
+yang sudah dibatalkan sebelum diambil writer tidak ditulis.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlmodel import Session
+
+from .db import engine
+from .ingest import apply_events, default_area_id
+from .occupancy import OccupancyTracker
+from .stats_buffer import StatsAggregator
+
+_STOP = object()
+
+
+class IngestQueueFull(Exception):
+    """Antrean ingest penuh; request sebaiknya dicoba lagi nanti"""
+
+
+class IngestWriter:
+    """Thread tunggal yang menulis event ingest dengan group commit"""
+
+    def __init__(self, aggregator: StatsAggregator, occupancy: OccupancyTracker,
+                 linger_ms: int, group_max: int, queue_max: int):
+        self.aggregator = aggregator
+        self.occupancy = occupancy
+        self.linger = linger_ms / 1000.0
+        self.group_max = group_max
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_max)
+        self._thread: Optional[threading.Thread] = None
+        self.groups = 0
+        self.events = 0
+        self.requests = 0
+        self.failed_groups = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> bool:
+        """Selesaikan request yang masih antre lalu hentikan thread. Returns False jika thread belum selesai."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=10)
+            if self._thread.is_alive():
+                return False
+            self._thread = None
+        return True
+
+    def submit(self, events: Sequence[Any]) -> "Future[List[Dict[str, bool]]]":
+        """Antrekan event (EventIn) satu request; Future berisi hasil apply_events"""
+        future: "Future[List[Dict[str, bool]]]" = Future()
+        try:
+            self._queue.put_nowait((list(events), future))
+        except queue.Full:
+            raise IngestQueueFull()
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        """Status writer untuk /health"""
+        return {
+            "queued": self._queue.qsize(),
+            "groups": self.groups,
+            "requests": self.requests,
+            "events": self.events,
+            "avg_events_per_commit": round(self.events / self.groups, 1) if self.groups else 0.0,
+            "failed_groups": self.failed_groups,
+        }
+
+    def _collect(self, first: Tuple[List[Any], Future]) -> Tuple[List[Tuple[List[Any], Future]], bool]:
+        """Ambil request yang menunggu sampai group_max event atau linger habis"""
+        group = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.linger
+        while size < self.group_max:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return group, True
+            group.append(item)
+            size += len(item[0])
+        return group, False
+
+    def _transaction(self, group: List[Tuple[List[Any], Future]]):
+        """Satu transaksi untuk semua request di grup. Returns (hasil, delta stats, event IN/OUT)."""
+        events = [e for request_events, _ in group for e in request_events]
+        with Session(engine) as session:
+            results, stats = apply_events(session, events)
+            moves = [
+                (e.event_time, e.camera_id, e.area_id or default_area_id(session, e.camera_id), e.direction)
+                for e, result in zip(events, results)
+                if not result["duplicate"] and e.direction in ("IN", "OUT")
+            ]
+            session.commit()
+        return results, stats, moves
+
+    def _publish(self, group: List[Tuple[List[Any], Future]], results, stats, moves):
+        """Pekerjaan setelah commit; tidak boleh memicu retry (event sudah tersimpan)"""
+        try:
+            self.aggregator.add(stats)
+            self.occupancy.record(moves)
+        except Exception as e:
+            print(f"[ingest] Post-commit stats update failed: {e}")
+        offset = 0
+        for request_events, future in group:
+            future.set_result(results[offset:offset + len(request_events)])
+            offset += len(request_events)
+        self.groups += 1
+        self.requests += len(group)
+        self.events += len(results)
+
+    def _process(self, group: List[Tuple[List[Any], Future]]):
+        """Tulis grup; jika transaksi gagal, ulang per request"""
+        # Request yang sudah dibatalkan (client putus) tidak ditulis
+        group = [request for request in group if request[1].set_running_or_notify_cancel()]
+        if not group:
+            return
+        try:
+            committed = self._transaction(group)
+        except Exception as e:
+            self.failed_groups += 1
+            if len(group) == 1:
+                group[0][1].set_exception(e)
+                return
+            print(f"[ingest] Group commit of {len(group)} requests failed: {e}; retrying individually")
+            for request in group:
+                try:
+                    committed = self._transaction([request])
+                except Exception as request_error:
+                    request[1].set_exception(request_error)
+                else:
+                    self._publish([request], *committed)
+        else:
+            self._publish(group, *committed)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            group, stopping = self._collect(item)
+            try:
+                self._process(group)
+            except Exception as e:
+                # Thread writer harus tetap hidup, kalau tidak semua ingest berikutnya menggantung
+                print(f"[ingest] Writer error: {e}")
+        # Sisa antrean saat shutdown
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                try:
+                    self._process([item])
+                except Exception as e:
+                    print(f"[ingest] Writer error: {e}")
@@ -3,25 +3,36 @@ Visitor Monitoring API - Backend FastAPI
 Sesuai dengan Project Concept: monitoring pengunjung perpustakaan dengan YOLOv5
 Database: SQLite (tanpa Docker)
 """
-from datetime import datetime, date
+import asyncio
+import json
+from datetime import datetime, date, timedelta
 from typing import List, Optional, Any
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
 
 from sqlmodel import Session, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .settings import settings
-from .db import init_db, get_session, engine
+from .db import init_db, get_session, get_read_session, get_async_session, engine, read_engine, async_read_engine
 from .models import (
     Role, User, Camera, CountingArea, 
-    VisitorDaily, VisitEvent, DailyStats
+    VisitorDaily, VisitEvent, DailyStats, HourlyStats, MinuteStats
+)
+from . import edge_config
+from .ingest_queue import IngestQueueFull, IngestWriter
+from .occupancy import OccupancyTracker
+from .stats_buffer import (
+    StatsAggregator, recompute_stats, recovery_start, was_clean_shutdown, set_clean_shutdown,
+    hour_bucket, five_minute_bucket, HOURLY, FIVE_MINUTE, STAT_FIELDS
 )
 from .auth import (
     hash_password, verify_password, create_access_token, 
-    get_user_by_username, get_role_by_name, require_role
+    get_user_by_username, get_role_by_name, require_role, invalidate_principal
 )
 
 app = FastAPI(title="Visitor Monitoring API", version="1.0.0")
@@ -35,6 +46,28 @@ app.add_middleware(
 )
 
 
+# Jumlah event maksimum per request /api/events/ingest/batch
+INGEST_BATCH_MAX = 5000
+
+# Delta daily_stats dari ingest, di-flush ke DB di background
+stats_aggregator = StatsAggregator(settings.stats_flush_ms)
+# Okupansi real-time (IN - OUT hari ini) di memori
+occupancy = OccupancyTracker()
+# Satu thread penulis untuk semua ingest (SQLite hanya punya satu write lock)
+ingest_writer = IngestWriter(
+    stats_aggregator,
+    occupancy,
+    linger_ms=settings.ingest_linger_ms,
+    group_max=settings.ingest_group_max,
+    queue_max=settings.ingest_queue_max
+)
+
+
+def to_local_naive(ts: datetime) -> datetime:
+    """Datetime dengan offset -> waktu lokal server tanpa tzinfo (format yang disimpan di DB)"""
+    return ts.astimezone().replace(tzinfo=None) if ts.tzinfo is not None else ts
+
+
 # ==================== Pydantic Schemas ====================
 
 class LoginIn(BaseModel):
@@ -105,6 +138,13 @@ class EventIn(BaseModel):
     visitor_key: str
     direction: Optional[str] = None  # IN/OUT
     confidence_avg: Optional[float] = None
+    # Idempotency key buatan edge; kirim ulang dengan id sama tidak dihitung dua kali
+    client_event_id: Optional[str] = Field(default=None, max_length=64)
+
+    @field_validator("event_time")
+    @classmethod
+    def _naive_event_time(cls, v: datetime) -> datetime:
+        return to_local_naive(v)
 
 class DailyStatsOut(BaseModel):
     stat_date: date
@@ -114,6 +154,19 @@ class DailyStatsOut(BaseModel):
     total_in: int
     total_out: int
 
+class TimeseriesPoint(BaseModel):
+    bucket_start: datetime
+    total_events: int
+    unique_visitors: int
+    total_in: int
+    total_out: int
+
+class HourlyStatsOut(BaseModel):
+    """Statistik per jam untuk satu hari (24 titik) + jam tersibuk"""
+    date: date
+    peak_hour: Optional[int]
+    hours: List[TimeseriesPoint]
+
 class DashboardSummary(BaseModel):
     """Summary untuk dashboard"""
     date: date
@@ -122,6 +175,24 @@ class DashboardSummary(BaseModel):
     total_in: int
     total_out: int
 
+class AreaOccupancyOut(BaseModel):
+    camera_id: int
+    area_id: int
+    inside: int
+    total_in: int
+    total_out: int
+    clamped: int
+    last_event_at: Optional[datetime]
+
+class OccupancyOut(BaseModel):
+    """Jumlah orang di dalam saat ini (IN - OUT hari ini, tidak pernah negatif)"""
+    date: date
+    inside: int
+    total_in: int
+    total_out: int
+    updated_at: Optional[datetime]
+    areas: List[AreaOccupancyOut]
+
 
 # ==================== Startup Event ====================
 
@@ -183,6 +254,65 @@ def on_startup():
             session.add(area)
             session.commit()
 
+        # Delta statistik yang belum di-flush hilang jika proses sebelumnya crash;
+        # setelah shutdown bersih tabel stats sudah lengkap dan tidak dihitung ulang
+        # Database lama tanpa rollup intraday: diisi dari seluruh visit_events.
+        # Dicek sebelum recompute, karena recompute sudah mengisi hari-hari terakhir
+        backfill_rollups = not session.exec(select(HourlyStats).limit(1)).first()
+        rows, since = {}, None
+        if not was_clean_shutdown(session):
+            since = recovery_start(session, max(1, settings.stats_recovery_days) - 1)
+            rows = recompute_stats(session, since)
+        first_event = session.exec(select(func.min(VisitEvent.event_time))).one()
+        if backfill_rollups and first_event and (since is None or first_event.date() < since):
+            rows.update({
+                table: count + rows.get(table, 0)
+                for table, count in recompute_stats(session, first_event.date(), ("hourly_stats", "minute_stats")).items()
+            })
+            since = first_event.date()
+        set_clean_shutdown(session, False)
+        session.commit()
+        if since is None:
+            print("[stats] Previous shutdown flushed cleanly, recompute skipped")
+        else:
+            print(f"[stats] Recomputed stats since {since} ({rows})")
+
+        # Okupansi hari ini dari rollup 5 menit (sudah lengkap setelah recompute)
+        today = date.today()
+        occupancy.load(today, session.exec(
+            select(MinuteStats.bucket_start, MinuteStats.camera_id, MinuteStats.area_id,
+                   MinuteStats.total_in, MinuteStats.total_out)
+            .where(MinuteStats.bucket_start >= datetime.combine(today, datetime.min.time()))
+            .order_by(MinuteStats.bucket_start)
+        ).all())
+        print(f"[stats] Occupancy restored: {occupancy.snapshot()['inside']} inside")
+
+    stats_aggregator.start()
+    ingest_writer.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """Selesaikan ingest yang masih antre, flush delta stats, lalu tandai shutdown bersih"""
+    if not ingest_writer.stop():
+        print("[ingest] Writer did not finish before shutdown; stats will be recomputed on next start")
+        return
+    try:
+        stats_aggregator.stop()
+    except Exception as e:
+        print(f"[stats] Final flush failed: {e}; stats will be recomputed on next start")
+        return
+    with Session(engine) as session:
+        set_clean_shutdown(session, True)
+        session.commit()
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    """Tutup koneksi aiosqlite"""
+    if async_read_engine is not None:
+        await async_read_engine.dispose()
+
 
 # ==================== Health Check ====================
 
@@ -190,13 +320,15 @@ def on_startup():
 async def health():
     """Health check endpoint"""
     try:
-        with Session(engine) as session:
+        with Session(read_engine) as session:
             session.exec(select(User).limit(1))
         
         return {
             "status": "healthy", 
             "timestamp": datetime.utcnow().isoformat(),
-            "database": "sqlite"
+            "database": "sqlite",
+            "stats": stats_aggregator.stats(),
+            "ingest": ingest_writer.stats()
         }
     except Exception as e:
         raise HTTPException(status_code=503, detail={
@@ -213,10 +345,11 @@ def login(payload: LoginIn, session: Session = Depends(get_session)):
         raise HTTPException(status_code=401, detail="Invalid username/password")
     if not user.is_active:
         raise HTTPException(status_code=401, detail="User is inactive")
-    return TokenOut(access_token=create_access_token(user.username))
+    role = session.get(Role, user.role_id)
+    return TokenOut(access_token=create_access_token(user.username, role.name if role else None))
 
 @app.get("/api/me", response_model=UserOut)
-def me(user: User = Depends(require_role("ADMIN", "OPERATOR")), session: Session = Depends(get_session)):
+def me(user: User = Depends(require_role("ADMIN", "OPERATOR")), session: Session = Depends(get_read_session)):
     role = session.get(Role, user.role_id)
     return UserOut(
         user_id=user.user_id, 
@@ -257,16 +390,16 @@ def create_user(payload: UserCreate, session: Session = Depends(get_session), _:
     )
 
 @app.get("/api/users", response_model=List[UserOut])
-def list_users(session: Session = Depends(get_session), _: User = Depends(require_role("ADMIN"))):
+def list_users(session: Session = Depends(get_read_session), _: User = Depends(require_role("ADMIN"))):
     users = session.exec(select(User)).all()
+    role_names = {r.role_id: r.name for r in session.exec(select(Role)).all()}
     result = []
     for u in users:
-        role = session.get(Role, u.role_id)
         result.append(UserOut(
             user_id=u.user_id, 
             username=u.username, 
             full_name=u.full_name,
-            role=role.name if role else "UNKNOWN",
+            role=role_names.get(u.role_id, "UNKNOWN"),
             is_active=u.is_active
         ))
     return result
@@ -300,6 +433,7 @@ def update_user(user_id: int, payload: UserUpdate, session: Session = Depends(ge
     session.add(u)
     session.commit()
     session.refresh(u)
+    invalidate_principal(u.username)
     role = session.get(Role, u.role_id)
     return UserOut(
         user_id=u.user_id,
@@ -322,13 +456,14 @@ def delete_user(user_id: int, session: Session = Depends(get_session), admin: Us
     u.updated_at = datetime.utcnow()
     session.add(u)
     session.commit()
+    invalidate_principal(u.username)
     return {"ok": True, "message": f"User '{u.username}' dinonaktifkan"}
 
 
 # ==================== Camera Management ====================
 
 @app.get("/api/cameras", response_model=List[CameraOut])
-def list_cameras(session: Session = Depends(get_session), _: User = Depends(require_role("ADMIN", "OPERATOR"))):
+def list_cameras(session: Session = Depends(get_read_session), _: User = Depends(require_role("ADMIN", "OPERATOR"))):
     cameras = session.exec(select(Camera)).all()
     return [CameraOut(
         camera_id=c.camera_id, 
@@ -339,7 +474,7 @@ def list_cameras(session: Session = Depends(get_session), _: User = Depends(requ
     ) for c in cameras]
 
 @app.get("/api/cameras/{camera_id}", response_model=CameraOut)
-def get_camera(camera_id: int, session: Session = Depends(get_session), _: User = Depends(require_role("ADMIN", "OPERATOR"))):
+def get_camera(camera_id: int, session: Session = Depends(get_read_session), _: User = Depends(require_role("ADMIN", "OPERATOR"))):
     cam = session.get(Camera, camera_id)
     if not cam:
         raise HTTPException(status_code=404, detail="Camera not found")
@@ -382,6 +517,7 @@ def update_camera(camera_id: int, payload: CameraUpdate, session: Session = Depe
     session.add(cam)
     session.commit()
     session.refresh(cam)
+    edge_config.invalidate(camera_id)
     return CameraOut(
         camera_id=cam.camera_id, 
         name=cam.name, 
@@ -404,13 +540,14 @@ def delete_camera(camera_id: int, session: Session = Depends(get_session), _: Us
     
     session.delete(cam)
     session.commit()
+    edge_config.invalidate(camera_id)
     return {"ok": True, "message": f"Camera '{cam.name}' deleted"}
 
 
 # ==================== Counting Area Management ====================
 
 @app.get("/api/cameras/{camera_id}/areas", response_model=List[CountingAreaOut])
-def list_counting_areas(camera_id: int, session: Session = Depends(get_session), _: User = Depends(require_role("ADMIN", "OPERATOR"))):
+def list_counting_areas(camera_id: int, session: Session = Depends(get_read_session), _: User = Depends(require_role("ADMIN", "OPERATOR"))):
     areas = session.exec(select(CountingArea).where(CountingArea.camera_id == camera_id)).all()
     return [CountingAreaOut(
         area_id=a.area_id,
@@ -437,6 +574,7 @@ def create_counting_area(payload: CountingAreaCreate, session: Session = Depends
     session.add(area)
     session.commit()
     session.refresh(area)
+    edge_config.invalidate(area.camera_id)
     return CountingAreaOut(
         area_id=area.area_id,
         camera_id=area.camera_id,
@@ -458,6 +596,7 @@ def update_counting_area(area_id: int, payload: CountingAreaUpdate, session: Ses
     session.add(area)
     session.commit()
     session.refresh(area)
+    edge_config.invalidate(area.camera_id)
     return CountingAreaOut(
         area_id=area.area_id,
         camera_id=area.camera_id,
@@ -476,106 +615,147 @@ def delete_counting_area(area_id: int, session: Session = Depends(get_session),
     
     session.delete(area)
     session.commit()
+    edge_config.invalidate(area.camera_id)
     return {"ok": True, "message": f"Counting area '{area.name}' deleted"}
 
 
+# ==================== Edge Config Sync ====================
+
+# Interval cek perubahan config (in-memory, tanpa query DB) dan keepalive SSE
+EDGE_CONFIG_POLL_SECONDS = 1.0
+EDGE_CONFIG_KEEPALIVE_SECONDS = 15.0
+
+
+def _load_edge_config(camera_id: int):
+    with Session(read_engine) as session:
+        return edge_config.get_edge_config(session, camera_id)
+
+
+@app.get("/api/edge/config/{camera_id}")
+def get_edge_config(
+    camera_id: int,
+    request: Request,
+    session: Session = Depends(get_read_session),
+    _: User = Depends(require_role("ADMIN", "OPERATOR")),
+):
+    """
+    Config kamera + counting areas untuk edge worker dalam satu response.
+    Response membawa ETag (versi config); kirim If-None-Match untuk mendapat 304
+    selama config tidak berubah.
+    """
+    result = edge_config.get_edge_config(session, camera_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    version, payload = result
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+
+@app.get("/api/edge/config/{camera_id}/stream")
+async def stream_edge_config(
+    camera_id: int,
+    request: Request,
+    _: User = Depends(require_role("ADMIN", "OPERATOR")),
+):
+    """
+    SSE: config kamera dikirim saat berlangganan lalu setiap kali admin mengubah
+    kamera/area. `id` tiap event = versi config; header Last-Event-ID (versi yang
+    sudah dimiliki edge) mencegah pengiriman ulang config yang sama.
+    """
+    if await run_in_threadpool(_load_edge_config, camera_id) is None:
+        raise HTTPException(status_code=404, detail="Camera not found")
+
+    async def events():
+        last_version = request.headers.get("last-event-id")
+        last_generation = None
+        idle = 0.0
+        while not await request.is_disconnected():
+            current = edge_config.generation(camera_id)
+            if current != last_generation:
+                last_generation = current
+                result = await run_in_threadpool(_load_edge_config, camera_id)
+                if result is None:
+                    yield "event: deleted\ndata: {}\n\n"
+                    return
+                version, payload = result
+                if version != last_version:
+                    last_version = version
+                    idle = 0.0
+                    yield f"id: {version}\ndata: {json.dumps(payload, default=str)}\n\n"
+            await asyncio.sleep(EDGE_CONFIG_POLL_SECONDS)
+            idle += EDGE_CONFIG_POLL_SECONDS
+            if idle >= EDGE_CONFIG_KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 # ==================== Event Ingestion (dari Edge) ====================
 
+async def _ingest(events: List[EventIn]):
+    """Serahkan event ke ingest writer dan tunggu hasil group commit-nya.
+    Bentrok unique index (client_event_id yang sama, visitor baru yang sama)
+    ditangani oleh upsert ON CONFLICT di apply_events."""
+    try:
+        future = ingest_writer.submit(events)
+    except IngestQueueFull:
+        raise HTTPException(status_code=503, detail="Antrean ingest penuh, coba lagi", headers={"Retry-After": "1"})
+    return await asyncio.wrap_future(future)
+
+
 @app.post("/api/events/ingest")
-def ingest_event(payload: EventIn, session: Session = Depends(get_session)):
+async def ingest_event(payload: EventIn):
     """
     Endpoint untuk menerima event kunjungan dari edge worker.
-    Logika pengunjung unik harian:
-    - Cek apakah (visit_date, visitor_key) sudah ada di visitor_daily
-    - Jika belum ada → insert visitor_daily (unik bertambah)
+    Logika pengunjung unik harian (upsert atomik, lihat app/ingest.py):
+    - (visit_date, visitor_key) belum ada di visitor_daily → insert (unik bertambah)
     - Jika sudah ada → update last_seen_at saja (unik tidak bertambah)
+    Event dengan client_event_id yang sudah pernah diterima → duplicate=True,
+    is_new_unique asli dikembalikan, statistik tidak berubah.
     """
-    # Get default area if not specified
-    area_id = payload.area_id
-    if not area_id:
-        area = session.exec(
-            select(CountingArea).where(CountingArea.camera_id == payload.camera_id, CountingArea.is_active == True)
-        ).first()
-        area_id = area.area_id if area else 1
-    
-    # Create visit event
-    ev = VisitEvent(
-        camera_id=payload.camera_id, 
-        area_id=area_id,
-        event_time=payload.event_time, 
-        track_id=payload.track_id,
-        visitor_key=payload.visitor_key,
-        direction=payload.direction,
-        confidence_avg=payload.confidence_avg
-    )
-    session.add(ev)
+    result = (await _ingest([payload]))[0]
+    return {"ok": True, **result}
 
-    # Handle unique daily visitor
-    visit_date = payload.event_time.date()
-    is_new_unique = False
-    
-    visitor_daily = session.exec(
-        select(VisitorDaily).where(
-            VisitorDaily.visit_date == visit_date,
-            VisitorDaily.visitor_key == payload.visitor_key
-        )
-    ).first()
-    
-    if not visitor_daily:
-        # New unique visitor for today
-        visitor_daily = VisitorDaily(
-            visit_date=visit_date,
-            visitor_key=payload.visitor_key,
-            first_seen_at=payload.event_time,
-            last_seen_at=payload.event_time
-        )
-        session.add(visitor_daily)
-        is_new_unique = True
-    else:
-        # Update last seen time
-        visitor_daily.last_seen_at = payload.event_time
-
-    # Update daily stats
-    stats = session.exec(
-        select(DailyStats).where(
-            DailyStats.stat_date == visit_date,
-            DailyStats.camera_id == payload.camera_id
-        )
-    ).first()
-    
-    if not stats:
-        stats = DailyStats(
-            stat_date=visit_date,
-            camera_id=payload.camera_id,
-            total_events=0,
-            unique_visitors=0,
-            total_in=0,
-            total_out=0
-        )
-        session.add(stats)
-    
-    stats.total_events += 1
-    if is_new_unique:
-        stats.unique_visitors += 1
-    if payload.direction == "IN":
-        stats.total_in += 1
-    elif payload.direction == "OUT":
-        stats.total_out += 1
-    stats.last_updated_at = datetime.utcnow()
 
-    session.commit()
-    return {"ok": True, "is_new_unique": is_new_unique}
+@app.post("/api/events/ingest/batch")
+async def ingest_events_batch(payload: List[EventIn]):
+    """
+    Terima banyak event sekaligus (array EventIn) dalam satu transaksi.
+    Hasil per event (is_new_unique) dikembalikan sesuai urutan input.
+    """
+    if len(payload) > INGEST_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Batch terlalu besar (maks {INGEST_BATCH_MAX} event)")
+    results = await _ingest(payload)
+    return {
+        "ok": True,
+        "count": len(results),
+        "duplicates": sum(1 for r in results if r["duplicate"]),
+        "results": results,
+    }
 
 
 # ==================== Statistics Endpoints ====================
 
+async def _all(session: AsyncSession, q):
+    """
+    Jalankan query async dan kembalikan semua baris (untuk read_consistent).
+    populate_existing: read ulang di session yang sama harus memakai nilai baru
+    dari DB, bukan objek lama di identity map.
+    """
+    return (await session.exec(q.execution_options(populate_existing=True))).all()
+
+
 @app.get("/api/stats/daily", response_model=List[DailyStatsOut])
-def stats_daily(
+async def stats_daily(
     day: Optional[date] = None, 
     from_date: Optional[date] = None,
     to_date: Optional[date] = None,
     camera_id: Optional[int] = None,
-    session: Session = Depends(get_session), 
+    session: AsyncSession = Depends(get_async_session), 
     _: User = Depends(require_role("ADMIN", "OPERATOR"))
 ):
     """Get daily statistics with optional filters"""
@@ -590,7 +770,14 @@ def stats_daily(
     if camera_id:
         q = q.where(DailyStats.camera_id == camera_id)
     
-    rows = session.exec(q.order_by(DailyStats.stat_date.desc())).all()
+    rows, pending = await stats_aggregator.read_consistent(lambda: _all(session, q))
+    rows = stats_aggregator.overlay(
+        rows,
+        lambda d, cid: (not day or d == day) and (not from_date or d >= from_date)
+        and (not to_date or d <= to_date) and (not camera_id or cid == camera_id),
+        pending
+    )
+    rows.sort(key=lambda r: (r.stat_date, r.camera_id), reverse=True)
     return [DailyStatsOut(
         stat_date=r.stat_date, 
         camera_id=r.camera_id, 
@@ -601,17 +788,18 @@ def stats_daily(
     ) for r in rows]
 
 @app.get("/api/stats/summary", response_model=DashboardSummary)
-def stats_summary(
+async def stats_summary(
     day: Optional[date] = None,
-    session: Session = Depends(get_session), 
+    session: AsyncSession = Depends(get_async_session), 
     _: User = Depends(require_role("ADMIN", "OPERATOR"))
 ):
     """Get summary for dashboard (aggregated across all cameras)"""
     target_date = day or date.today()
     
-    stats = session.exec(
-        select(DailyStats).where(DailyStats.stat_date == target_date)
-    ).all()
+    rows, pending = await stats_aggregator.read_consistent(
+        lambda: _all(session, select(DailyStats).where(DailyStats.stat_date == target_date))
+    )
+    stats = stats_aggregator.overlay(rows, lambda d, _cid: d == target_date, pending)
     
     total_events = sum(s.total_events for s in stats)
     unique_visitors = sum(s.unique_visitors for s in stats)
@@ -627,14 +815,122 @@ def stats_summary(
     )
 
 
+# Jumlah titik maksimum per request /api/stats/timeseries
+TIMESERIES_MAX_POINTS = 10000
+_BUCKET_STEPS = {"5min": timedelta(minutes=5), "hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+async def _rollup_series(
+    session: AsyncSession,
+    bucket: str,
+    start: datetime,
+    end: datetime,
+    camera_id: Optional[int],
+    area_id: Optional[int]
+) -> List[TimeseriesPoint]:
+    """
+    Deret waktu [start, end) dari rollup (minute_stats untuk 5min, hourly_stats
+    untuk hour/day) ditambah delta yang belum di-flush; bucket kosong = 0.
+    """
+    table = MinuteStats if bucket == "5min" else HourlyStats
+    q = select(table.bucket_start, *[func.sum(getattr(table, f)) for f in STAT_FIELDS]).where(
+        table.bucket_start >= start, table.bucket_start < end
+    )
+    if camera_id:
+        q = q.where(table.camera_id == camera_id)
+    if area_id:
+        q = q.where(table.area_id == area_id)
+    rows, pending = await stats_aggregator.read_consistent(lambda: _all(session, q.group_by(table.bucket_start)))
+
+    def to_bucket(ts: datetime) -> datetime:
+        return ts.replace(hour=0) if bucket == "day" else ts
+
+    totals = {}
+    for bucket_start, *values in rows:
+        point = totals.setdefault(to_bucket(bucket_start), dict.fromkeys(STAT_FIELDS, 0))
+        for name, value in zip(STAT_FIELDS, values):
+            point[name] += value or 0
+    for (bucket_start, cid, aid), delta in stats_aggregator.pending_rollup(FIVE_MINUTE if bucket == "5min" else HOURLY, pending).items():
+        if start <= bucket_start < end and (not camera_id or cid == camera_id) and (not area_id or aid == area_id):
+            point = totals.setdefault(to_bucket(bucket_start), dict.fromkeys(STAT_FIELDS, 0))
+            for name, value in delta.items():
+                point[name] += value
+
+    points = []
+    ts, step = to_bucket(start), _BUCKET_STEPS[bucket]
+    while ts < end:
+        points.append(TimeseriesPoint(bucket_start=ts, **totals.get(ts, dict.fromkeys(STAT_FIELDS, 0))))
+        ts += step
+    return points
+
+@app.get("/api/stats/hourly", response_model=HourlyStatsOut)
+async def stats_hourly(
+    day: Optional[date] = None,
+    camera_id: Optional[int] = None,
+    area_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_async_session),
+    _: User = Depends(require_role("ADMIN", "OPERATOR"))
+):
+    """Statistik per jam (00-23) untuk satu hari dari hourly_stats, plus jam tersibuk"""
+    target_date = day or date.today()
+    start = datetime.combine(target_date, datetime.min.time())
+    hours = await _rollup_series(session, "hour", start, start + timedelta(days=1), camera_id, area_id)
+    busiest = max(hours, key=lambda p: p.total_events)
+    return HourlyStatsOut(
+        date=target_date,
+        peak_hour=busiest.bucket_start.hour if busiest.total_events else None,
+        hours=hours
+    )
+
+@app.get("/api/stats/timeseries", response_model=List[TimeseriesPoint])
+async def stats_timeseries(
+    from_time: Optional[datetime] = None,
+    to_time: Optional[datetime] = None,
+    bucket: str = "hour",
+    camera_id: Optional[int] = None,
+    area_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_async_session),
+    _: User = Depends(require_role("ADMIN", "OPERATOR"))
+):
+    """
+    Deret waktu [from_time, to_time) dengan bucket 5min / hour / day dari tabel
+    rollup (tanpa scan visit_events). Default: hari ini.
+    """
+    if bucket not in _BUCKET_STEPS:
+        raise HTTPException(status_code=400, detail="bucket harus salah satu dari: 5min, hour, day")
+    # Parameter dengan offset (mis. ...Z) disamakan dengan bucket_start (waktu lokal naive)
+    start = to_local_naive(from_time) if from_time else datetime.combine(date.today(), datetime.min.time())
+    end = to_local_naive(to_time) if to_time else start + timedelta(days=1)
+    # Ratakan ke awal bucket agar titik sejajar dengan baris rollup
+    start = five_minute_bucket(start) if bucket == "5min" else hour_bucket(start)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="to_time harus setelah from_time")
+    if (end - start) / _BUCKET_STEPS[bucket] > TIMESERIES_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"Rentang terlalu panjang (maks {TIMESERIES_MAX_POINTS} titik)")
+    return await _rollup_series(session, bucket, start, end, camera_id, area_id)
+
+
+@app.get("/api/stats/occupancy", response_model=OccupancyOut)
+async def stats_occupancy(
+    camera_id: Optional[int] = None,
+    area_id: Optional[int] = None,
+    _: User = Depends(require_role("ADMIN", "OPERATOR"))
+):
+    """
+    Okupansi real-time per area dan seluruh lokasi, dari OccupancyTracker di
+    memori (tanpa query visit_events). Direset setiap pergantian hari.
+    """
+    return occupancy.snapshot(camera_id, area_id)
+
+
 # ==================== Reports ====================
 
 @app.get("/api/reports/csv")
-def report_csv(
+async def report_csv(
     from_day: date, 
     to_day: date, 
     camera_id: Optional[int] = None,
-    session: Session = Depends(get_session), 
+    session: AsyncSession = Depends(get_async_session), 
     _: User = Depends(require_role("ADMIN", "OPERATOR"))
 ):
     """Export daily statistics to CSV as downloadable file"""
@@ -651,7 +947,11 @@ def report_csv(
     if camera_id:
         q = q.where(DailyStats.camera_id == camera_id)
     
-    rows = session.exec(q.order_by(DailyStats.stat_date)).all()
+    rows, pending = await stats_aggregator.read_consistent(lambda: _all(session, q))
+    rows = stats_aggregator.overlay(
+        rows, lambda d, cid: from_day <= d <= to_day and (not camera_id or cid == camera_id), pending
+    )
+    rows.sort(key=lambda r: (r.stat_date, r.camera_id))
     for r in rows:
         writer.writerow([
             r.stat_date.isoformat(), 
@@ -672,12 +972,12 @@ def report_csv(
     )
 
 @app.get("/api/reports/events")
-def report_events(
+async def report_events(
     from_date: date,
     to_date: date,
     camera_id: Optional[int] = None,
     limit: int = 1000,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     _: User = Depends(require_role("ADMIN", "OPERATOR"))
 ):
     """Get detailed visit events for reporting"""
@@ -690,7 +990,7 @@ def report_events(
     if camera_id:
         q = q.where(VisitEvent.camera_id == camera_id)
     
-    events = session.exec(q.order_by(VisitEvent.event_time.desc()).limit(limit)).all()
+    events = (await session.exec(q.order_by(VisitEvent.event_time.desc()).limit(limit))).all()
     
     return [{
         "event_id": e.event_id,
@@ -719,7 +1019,7 @@ def list_visitor_daily(
     from_date: Optional[date] = None,
     to_date: Optional[date] = None,
     limit: int = 500,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     _: User = Depends(require_role("ADMIN", "OPERATOR"))
 ):
     """List unique daily visitors"""
@@ -743,7 +1043,7 @@ def list_visitor_daily(
     } for v in visitors]
 
 @app.get("/api/cameras/list/all", response_model=List[CameraOut])
-def list_all_cameras(session: Session = Depends(get_session), _: User = Depends(require_role("ADMIN", "OPERATOR"))):
+def list_all_cameras(session: Session = Depends(get_read_session), _: User = Depends(require_role("ADMIN", "OPERATOR"))):
     """List all cameras (including inactive) for admin management"""
     cameras = session.exec(select(Camera)).all()
     return [CameraOut(
@@ -761,22 +1061,30 @@ def reset_database(
     user: User = Depends(require_role("ADMIN"))
 ):
     """
-    Reset semua data pengunjung (visitor_daily, visit_events, daily_stats)
+    Reset semua data pengunjung (visitor_daily, visit_events, daily_stats, hourly_stats, minute_stats)
+    beserta okupansi real-time
     Hanya bisa diakses oleh ADMIN
     """
     try:
-        # Delete all visitor data
-        session.exec(select(VisitEvent)).all()
-        for event in session.exec(select(VisitEvent)).all():
-            session.delete(event)
+        # Flush ditahan: delta yang sedang ditulis tidak boleh masuk lagi ke tabel yang baru direset
+        with stats_aggregator.flush_paused():
+            # Delete all visitor data
+            session.exec(select(VisitEvent)).all()
+            for event in session.exec(select(VisitEvent)).all():
+                session.delete(event)
         
-        for visitor in session.exec(select(VisitorDaily)).all():
-            session.delete(visitor)
+            for visitor in session.exec(select(VisitorDaily)).all():
+                session.delete(visitor)
         
-        for stat in session.exec(select(DailyStats)).all():
-            session.delete(stat)
+            for stat in session.exec(select(DailyStats)).all():
+                session.delete(stat)
+            for table in (HourlyStats, MinuteStats):
+                for stat in session.exec(select(table)).all():
+                    session.delete(stat)
         
-        session.commit()
+            session.commit()
+            stats_aggregator.discard()
+        occupancy.reset()
         
         return {
             "status": "success",
@@ -1,6 +1,8 @@
 """
 Database Models sesuai Project Concept
 - roles, users, cameras, counting_areas, visitor_daily, visit_events, daily_stats
+- hourly_stats, minute_stats: rollup per jam / per 5 menit untuk grafik intraday
+- stats_checkpoint: penanda shutdown bersih untuk write-behind stats
 """
 from typing import Optional, List, Any
 from datetime import datetime, date
@@ -91,6 +93,9 @@ class VisitEvent(SQLModel, table=True):
     direction: Optional[str] = Field(default=None, max_length=10)  # IN/OUT
     confidence_avg: Optional[float] = Field(default=None)
     snapshot_path: Optional[str] = Field(default=None, sa_column=Column(Text))
+    # Idempotency key dari edge: event yang dikirim ulang (retry) tidak dihitung dua kali
+    client_event_id: Optional[str] = Field(default=None, max_length=64, unique=True, index=True)
+    is_new_unique: bool = Field(default=False)  # hasil ingest asli, dikembalikan saat replay
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
@@ -105,3 +110,50 @@ class DailyStats(SQLModel, table=True):
     total_in: int = Field(default=0)
     total_out: int = Field(default=0)
     last_updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class HourlyStats(SQLModel, table=True):
+    """
+    Tabel hourly_stats: rollup per jam per (kamera, area), diperbarui saat ingest.
+    unique_visitors = pengunjung unik harian yang pertama kali terlihat di jam ini
+    (jumlah seluruh jam dalam sehari = unique_visitors harian).
+    """
+    __tablename__ = "hourly_stats"
+
+    bucket_start: datetime = Field(primary_key=True)
+    camera_id: int = Field(primary_key=True, foreign_key="cameras.camera_id")
+    area_id: int = Field(primary_key=True, foreign_key="counting_areas.area_id")
+    total_events: int = Field(default=0)
+    unique_visitors: int = Field(default=0)
+    total_in: int = Field(default=0)
+    total_out: int = Field(default=0)
+    last_updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class MinuteStats(SQLModel, table=True):
+    """Tabel minute_stats: rollup per 5 menit per (kamera, area), sama seperti hourly_stats"""
+    __tablename__ = "minute_stats"
+
+    bucket_start: datetime = Field(primary_key=True)
+    camera_id: int = Field(primary_key=True, foreign_key="cameras.camera_id")
+    area_id: int = Field(primary_key=True, foreign_key="counting_areas.area_id")
+    total_events: int = Field(default=0)
+    unique_visitors: int = Field(default=0)
+    total_in: int = Field(default=0)
+    total_out: int = Field(default=0)
+    last_updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class StatsCheckpoint(SQLModel, table=True):
+    """
+    Satu baris status write-behind stats: clean_shutdown=True jika proses
+    terakhir berhenti setelah semua delta di-flush (startup tidak perlu
+    menghitung ulang dari visit_events)
+    """
+    __tablename__ = "stats_checkpoint"
+
+    checkpoint_id: int = Field(default=1, primary_key=True)
+    clean_shutdown: bool = Field(default=False)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Flush terakhir yang berhasil (UTC); recovery setelah crash dimulai dari sini
+    last_flush_at: Optional[datetime] = Field(default=None)
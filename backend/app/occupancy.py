@@ -0,0 +1,124 @@
+"""
+Okupansi real-time: berapa orang yang sedang berada di dalam.
+
+Dulu satu-satunya cara menjawabnya adalah SUM(IN) - SUM(OUT) atas
+visit_events. Sekarang OccupancyTracker menyimpan hitungan per (kamera, area)
+dan total seluruh lokasi di memori, di-update oleh ingest writer dari event
+IN/OUT yang sudah di-commit (urut sesuai ingest), sehingga
+/api/stats/occupancy tidak menyentuh database.
+
+- OUT saat area kosong (IN terlewat oleh kamera) di-clamp ke nol dan dihitung
+  di `clamped`, supaya okupansi tidak pernah negatif.
+- Hitungan direset saat hari berganti: event pertama hari baru, atau read
+  pertama setelah tengah malam. Event dari hari sebelumnya (replay outbox)
+  tidak mengubah okupansi hari ini.
+- Saat startup, hitungan dibangun ulang dari minute_stats hari ini (per
+  5 menit, clamp per bucket), bukan dari visit_events.
+"""
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# (camera_id, area_id)
+AreaKey = Tuple[int, int]
+# (event_time, camera_id, area_id, direction)
+Move = Tuple[datetime, int, int, Optional[str]]
+
+
+def _empty_area() -> Dict[str, Any]:
+    return {"inside": 0, "total_in": 0, "total_out": 0, "clamped": 0, "last_event_at": None}
+
+
+class OccupancyTracker:
+    """Hitungan okupansi hari ini per area dan total, di memori"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day = date.today()
+        self._areas: Dict[AreaKey, Dict[str, Any]] = {}
+        # Total di-update bersama area, jadi read seluruh lokasi O(1)
+        self._inside = 0
+        self._total_in = 0
+        self._total_out = 0
+        self.updated_at: Optional[datetime] = None
+
+    def _reset(self, day: date):
+        self._day = day
+        self._areas = {}
+        self._inside = self._total_in = self._total_out = 0
+
+    def _roll_day(self, day: date):
+        if day > self._day:
+            self._reset(day)
+
+    def _apply(self, key: AreaKey, n_in: int, n_out: int, at: datetime):
+        area = self._areas.get(key)
+        if area is None:
+            area = self._areas[key] = _empty_area()
+        inside = area["inside"] + n_in - n_out
+        if inside < 0:
+            area["clamped"] += -inside
+            inside = 0
+        self._inside += inside - area["inside"]
+        area["inside"] = inside
+        area["total_in"] += n_in
+        area["total_out"] += n_out
+        self._total_in += n_in
+        self._total_out += n_out
+        if area["last_event_at"] is None or at > area["last_event_at"]:
+            area["last_event_at"] = at
+
+    def record(self, moves: Iterable[Move]):
+        """Terapkan event IN/OUT yang sudah di-commit, urut sesuai ingest"""
+        with self._lock:
+            for event_time, camera_id, area_id, direction in moves:
+                if direction not in ("IN", "OUT"):
+                    continue
+                day = event_time.date()
+                self._roll_day(day)
+                if day < self._day:
+                    continue
+                is_in = direction == "IN"
+                self._apply((camera_id, area_id), int(is_in), int(not is_in), event_time)
+            self.updated_at = datetime.utcnow()
+
+    def load(self, day: date, buckets: Iterable[Tuple[datetime, int, int, int, int]]):
+        """
+        Bangun ulang dari rollup (bucket_start, camera_id, area_id, total_in,
+        total_out) hari `day`, urut bucket_start.
+        """
+        with self._lock:
+            self._reset(day)
+            for bucket_start, camera_id, area_id, n_in, n_out in buckets:
+                self._apply((camera_id, area_id), n_in, n_out, bucket_start)
+            self.updated_at = datetime.utcnow()
+
+    def reset(self):
+        """Kosongkan hitungan hari ini (setelah data pengunjung direset)"""
+        with self._lock:
+            self._reset(date.today())
+            self.updated_at = datetime.utcnow()
+
+    def snapshot(self, camera_id: Optional[int] = None, area_id: Optional[int] = None) -> Dict[str, Any]:
+        """Okupansi saat ini; tanpa filter total diambil langsung (O(1))"""
+        with self._lock:
+            self._roll_day(date.today())
+            areas = [
+                {"camera_id": cid, "area_id": aid, **counts}
+                for (cid, aid), counts in sorted(self._areas.items())
+                if (camera_id is None or cid == camera_id) and (area_id is None or aid == area_id)
+            ]
+            if camera_id is None and area_id is None:
+                inside, total_in, total_out = self._inside, self._total_in, self._total_out
+            else:
+                inside = sum(a["inside"] for a in areas)
+                total_in = sum(a["total_in"] for a in areas)
+                total_out = sum(a["total_out"] for a in areas)
+            return {
+                "date": self._day,
+                "inside": inside,
+                "total_in": total_in,
+                "total_out": total_out,
+                "updated_at": self.updated_at,
+                "areas": areas,
+            }
@@ -11,6 +11,8 @@ class Settings(BaseSettings):
     jwt_secret: str = "change-me-in-production"
     jwt_alg: str = "HS256"
     jwt_exp_minutes: int = 60 * 24
+    # Cache token -> user/role di proses (detik); 0 = lookup DB setiap request
+    auth_cache_ttl_seconds: int = 30
 
     admin_username: str = "admin"
     admin_password: str = "admin123"
@@ -22,6 +24,30 @@ class Settings(BaseSettings):
 
     # SQLite database - no Docker dependency
     database_url: str = f"sqlite:///{os.path.join(BASE_DIR, 'visitors.db')}"
+    # Log setiap statement SQL (dulu otomatis di APP_ENV=dev)
+    sql_echo: bool = False
+
+    # Profil SQLite: WAL + pragma di bawah + pool read-only terpisah untuk GET.
+    # sqlite_tuned=false = perilaku lama (rollback journal, satu engine)
+    sqlite_tuned: bool = True
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_cache_mb: int = 64
+    sqlite_mmap_mb: int = 256
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_read_pool_size: int = 8
+
+    # daily_stats write-behind: interval flush delta, dan jumlah hari yang
+    # dihitung ulang dari visit_events saat startup setelah crash, dihitung
+    # mundur dari flush terakhir proses yang mati (bukan dari hari ini)
+    stats_flush_ms: int = 1000
+    stats_recovery_days: int = 2
+
+    # Single-writer ingest: request yang antre selama commit sebelumnya digabung
+    # dalam satu commit (maks ingest_group_max event); ingest_linger_ms > 0
+    # menunggu request tambahan (grup lebih besar, latensi lebih tinggi)
+    ingest_linger_ms: int = 0
+    ingest_group_max: int = 5000
+    ingest_queue_max: int = 10000
 
     cors_origins: str = "http://localhost:3000,http://127.0.0.1:3000"
 
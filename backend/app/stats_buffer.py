@@ -0,0 +1,347 @@
+"""
+Write-behind aggregator untuk daily_stats dan rollup intraday.
+
+Setiap event dulu meng-update baris daily_stats (stat_date, camera_id) yang
+sama, sehingga semua writer antre di satu baris panas. Sekarang ingest hanya
+menambahkan delta ke memori setelah commit berhasil, dan background thread
+menulis delta yang terkumpul setiap STATS_FLUSH_MS (dan sekali lagi saat
+shutdown). Delta yang sama juga dijumlahkan ke rollup per jam (hourly_stats)
+dan per 5 menit (minute_stats) per (kamera, area), sehingga grafik intraday
+tidak perlu memindai visit_events.
+
+Endpoint dashboard membaca tabel dari DB lalu menambahkan delta yang belum
+di-flush (`read_consistent` + `overlay` / `pending_rollup`), sehingga angka
+tetap real-time. `epoch` ganjil selama flush menulis; read yang beririsan
+dengan flush diulang, supaya delta tidak terhitung dua kali (sudah di DB dan
+masih inflight) atau hilang (DB dibaca sebelum commit, pending sesudahnya). Jika
+proses mati sebelum flush, delta di memori hilang; stats_checkpoint mencatat
+apakah shutdown terakhir sempat flush, dan jika tidak, startup memakai
+`recompute_stats` untuk menghitung ulang beberapa hari terakhir dari
+visit_events (sumber kebenaran).
+"""
+import asyncio
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, DateTime, bindparam, text
+from sqlmodel import Session
+
+from .db import engine
+from .models import DailyStats, StatsCheckpoint
+
+# Key delta: (nama rollup, *kolom key tabelnya)
+#   ("daily", stat_date, camera_id)
+#   ("hourly" / "5min", bucket_start, camera_id, area_id)
+StatsKey = Tuple
+StatsDelta = Dict[str, int]
+
+STAT_FIELDS = ("total_events", "unique_visitors", "total_in", "total_out")
+DAILY, HOURLY, FIVE_MINUTE = "daily", "hourly", "5min"
+BUCKET_MINUTES = 5
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def five_minute_bucket(ts: datetime) -> datetime:
+    return ts.replace(minute=ts.minute - ts.minute % BUCKET_MINUTES, second=0, microsecond=0)
+
+
+def _upsert(table: str, key_columns: Tuple[str, ...]):
+    """INSERT ... ON CONFLICT DO UPDATE yang menambahkan delta ke baris rollup"""
+    columns = key_columns + STAT_FIELDS + ("last_updated_at",)
+    values = [f":{c}" for c in key_columns + STAT_FIELDS] + [":now"]
+    updates = [f"{c} = {c} + excluded.{c}" for c in STAT_FIELDS] + ["last_updated_at = excluded.last_updated_at"]
+    return text(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(values)}) "
+        f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {', '.join(updates)}"
+    ).bindparams(bindparam("now", type_=DateTime))
+
+
+_BUCKET_KEY = ("bucket_start", "camera_id", "area_id")
+# rollup -> (upsert, kolom key)
+_ROLLUPS = {
+    DAILY: (_upsert("daily_stats", ("stat_date", "camera_id")).bindparams(bindparam("stat_date", type_=Date)),
+            ("stat_date", "camera_id")),
+    HOURLY: (_upsert("hourly_stats", _BUCKET_KEY).bindparams(bindparam("bucket_start", type_=DateTime)), _BUCKET_KEY),
+    FIVE_MINUTE: (_upsert("minute_stats", _BUCKET_KEY).bindparams(bindparam("bucket_start", type_=DateTime)), _BUCKET_KEY),
+}
+
+# Hitung ulang dari visit_events. unique_visitors dari flag is_new_unique yang
+# disimpan saat ingest; bucket ditulis dalam format DateTime SQLAlchemy.
+_RECOMPUTE_SELECT = """
+    SELECT {key}, camera_id, {area}COUNT(*), SUM(is_new_unique),
+           SUM(direction = 'IN'), SUM(direction = 'OUT'), :now
+    FROM visit_events
+    WHERE event_time >= :since
+    GROUP BY {key}, camera_id{group_area}
+"""
+_HOUR_EXPR = "strftime('%Y-%m-%d %H:00:00.000000', event_time)"
+_FIVE_MINUTE_EXPR = (
+    "strftime('%Y-%m-%d %H:', event_time) || "
+    f"printf('%02d', CAST(strftime('%M', event_time) AS INTEGER) / {BUCKET_MINUTES} * {BUCKET_MINUTES}) || "
+    "'\\:00.000000'"  # \: = titik dua literal untuk text()
+)
+_RECOMPUTE = [
+    ("daily_stats", "stat_date", "stat_date, camera_id", "date(event_time)", False),
+    ("hourly_stats", "bucket_start", "bucket_start, camera_id, area_id", _HOUR_EXPR, True),
+    ("minute_stats", "bucket_start", "bucket_start, camera_id, area_id", _FIVE_MINUTE_EXPR, True),
+]
+
+
+def event_deltas(stats: Dict[StatsKey, StatsDelta], event_time: datetime, camera_id: int, area_id: int,
+                 direction: Optional[str], is_new_unique: bool):
+    """Tambahkan satu event ke delta harian, per jam dan per 5 menit"""
+    for key in (
+        (DAILY, event_time.date(), camera_id),
+        (HOURLY, hour_bucket(event_time), camera_id, area_id),
+        (FIVE_MINUTE, five_minute_bucket(event_time), camera_id, area_id),
+    ):
+        delta = stats.setdefault(key, dict.fromkeys(STAT_FIELDS, 0))
+        delta["total_events"] += 1
+        if is_new_unique:
+            delta["unique_visitors"] += 1
+        if direction == "IN":
+            delta["total_in"] += 1
+        elif direction == "OUT":
+            delta["total_out"] += 1
+
+
+def _add_into(target: Dict[StatsKey, StatsDelta], deltas: Dict[StatsKey, StatsDelta]):
+    for key, delta in deltas.items():
+        row = target.setdefault(key, dict.fromkeys(STAT_FIELDS, 0))
+        for name, n in delta.items():
+            row[name] += n
+
+
+class StatsAggregator:
+    """Delta statistik di memori, di-flush ke DB oleh background thread"""
+
+    def __init__(self, flush_ms: int):
+        self.flush_interval = flush_ms / 1000.0
+        self._lock = threading.Lock()
+        self._pending: Dict[StatsKey, StatsDelta] = {}
+        # Delta yang sedang ditulis: tetap terlihat oleh `pending()` sampai commit
+        self._inflight: Dict[StatsKey, StatsDelta] = {}
+        self._flush_lock = threading.Lock()
+        # Genap = tidak ada flush yang sedang commit; naik setiap flush mulai/selesai
+        self._epoch = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.last_flush_at: Optional[datetime] = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="stats-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Hentikan thread lalu flush sisa delta"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def add(self, deltas: Dict[StatsKey, StatsDelta]):
+        """Tambahkan delta dari event yang sudah di-commit"""
+        if deltas:
+            with self._lock:
+                _add_into(self._pending, deltas)
+
+    def pending(self) -> Dict[StatsKey, StatsDelta]:
+        """Salinan delta yang belum ada di DB"""
+        merged: Dict[StatsKey, StatsDelta] = {}
+        with self._lock:
+            _add_into(merged, self._inflight)
+            _add_into(merged, self._pending)
+        return merged
+
+    def pending_rollup(self, rollup: str,
+                       pending: Optional[Dict[StatsKey, StatsDelta]] = None) -> Dict[StatsKey, StatsDelta]:
+        """Delta yang belum di-flush untuk satu rollup, key tanpa nama rollup"""
+        if pending is None:
+            pending = self.pending()
+        return {key[1:]: delta for key, delta in pending.items() if key[0] == rollup}
+
+    async def read_consistent(self, read: Callable[[], Awaitable[Any]]) -> Tuple[Any, Dict[StatsKey, StatsDelta]]:
+        """
+        Jalankan `read()` (query tabel stats) dan ambil delta yang belum di-flush
+        dari snapshot yang sama: diulang jika ada flush yang commit di antaranya.
+        Returns (hasil read, pending).
+        """
+        while True:
+            epoch = self._epoch
+            if epoch % 2 == 0:
+                result = await read()
+                with self._lock:
+                    if self._epoch == epoch:
+                        pending: Dict[StatsKey, StatsDelta] = {}
+                        _add_into(pending, self._inflight)
+                        _add_into(pending, self._pending)
+                        return result, pending
+            await asyncio.sleep(0.005)
+
+    @contextmanager
+    def flush_paused(self):
+        """Tahan flush (menunggu flush yang sedang berjalan), mis. selama reset-db"""
+        with self._flush_lock:
+            yield
+
+    def discard(self):
+        """Buang delta yang belum di-flush (setelah data pengunjung direset, di dalam flush_paused)"""
+        with self._lock:
+            self._pending.clear()
+            self._inflight.clear()
+            self._epoch += 2  # read yang sedang berjalan diulang
+
+    def flush(self) -> int:
+        """Tulis delta ke tabel statistik dalam satu transaksi. Returns jumlah baris."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._inflight, self._pending = self._pending, {}
+                self._epoch += 1
+            try:
+                now = datetime.utcnow()
+                with Session(engine) as session:
+                    for key, delta in self._inflight.items():
+                        upsert, key_columns = _ROLLUPS[key[0]]
+                        session.execute(upsert, {**dict(zip(key_columns, key[1:])), "now": now, **delta})
+                    session.execute(_MARK_FLUSH, {"now": now})
+                    session.commit()
+            except Exception:
+                # Kembalikan ke pending; dicoba lagi pada flush berikutnya
+                with self._lock:
+                    _add_into(self._pending, self._inflight)
+                    self._inflight = {}
+                    self._epoch += 1
+                raise
+            with self._lock:
+                count, self._inflight = len(self._inflight), {}
+                self._epoch += 1
+            self.flushes += 1
+            self.last_flush_at = now
+            return count
+
+    def overlay(self, rows: Iterable[DailyStats], keep: Callable[[date, int], bool],
+                pending: Dict[StatsKey, StatsDelta]) -> List[DailyStats]:
+        """
+        Baris daily_stats dari DB ditambah delta yang belum di-flush (`pending`
+        dari `read_consistent` yang sama). `keep(stat_date, camera_id)`
+        menyaring delta sesuai filter query; baris hasil adalah salinan.
+        """
+        merged: Dict[StatsKey, DailyStats] = {
+            (r.stat_date, r.camera_id): DailyStats(
+                stat_date=r.stat_date,
+                camera_id=r.camera_id,
+                total_events=r.total_events,
+                unique_visitors=r.unique_visitors,
+                total_in=r.total_in,
+                total_out=r.total_out,
+                last_updated_at=r.last_updated_at
+            )
+            for r in rows
+        }
+        for (stat_date, camera_id), delta in self.pending_rollup(DAILY, pending).items():
+            if not keep(stat_date, camera_id):
+                continue
+            row = merged.get((stat_date, camera_id))
+            if row is None:
+                row = DailyStats(stat_date=stat_date, camera_id=camera_id, **dict.fromkeys(STAT_FIELDS, 0))
+                merged[(stat_date, camera_id)] = row
+            for name, n in delta.items():
+                setattr(row, name, getattr(row, name) + n)
+        return list(merged.values())
+
+    def stats(self) -> Dict[str, object]:
+        """Status aggregator untuk /health"""
+        return {
+            "pending_rows": len(self.pending()),
+            "flush_ms": int(self.flush_interval * 1000),
+            "flushes": self.flushes,
+            "last_flush_at": self.last_flush_at.isoformat() if self.last_flush_at else None,
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[stats] Flush stats failed: {e}")
+
+
+# Dicatat di transaksi flush yang sama dengan delta-nya
+_MARK_FLUSH = text("""
+    INSERT INTO stats_checkpoint (checkpoint_id, clean_shutdown, updated_at, last_flush_at)
+    VALUES (1, 0, :now, :now)
+    ON CONFLICT (checkpoint_id) DO UPDATE SET last_flush_at = excluded.last_flush_at
+""").bindparams(bindparam("now", type_=DateTime))
+
+
+def was_clean_shutdown(session: Session) -> bool:
+    """True jika proses sebelumnya berhenti setelah flush terakhir berhasil"""
+    checkpoint = session.get(StatsCheckpoint, 1)
+    return bool(checkpoint and checkpoint.clean_shutdown)
+
+
+def recovery_start(session: Session, slack_days: int) -> date:
+    """
+    Tanggal awal recompute setelah shutdown tidak bersih: delta yang hilang
+    adalah event setelah flush terakhir proses yang mati (atau setelah proses
+    itu start jika belum sempat flush), bukan hanya hari ini/kemarin — proses
+    bisa baru dijalankan lagi beberapa hari setelah crash. `slack_days` hari
+    ekstra untuk event terlambat (replay outbox dengan event_time lama).
+    """
+    start = date.today()
+    checkpoint = session.get(StatsCheckpoint, 1)
+    anchors = [t for t in (checkpoint.updated_at, checkpoint.last_flush_at) if t] if checkpoint else []
+    if anchors:
+        # Timestamp checkpoint dalam UTC, stat_date/event_time dalam waktu lokal
+        start = min(start, max(anchors).replace(tzinfo=timezone.utc).astimezone().date())
+    return start - timedelta(days=slack_days)
+
+
+def set_clean_shutdown(session: Session, clean: bool):
+    """Tandai status shutdown (tanpa commit); False selama proses berjalan"""
+    checkpoint = session.get(StatsCheckpoint, 1) or StatsCheckpoint(checkpoint_id=1)
+    checkpoint.clean_shutdown = clean
+    checkpoint.updated_at = datetime.utcnow()
+    session.add(checkpoint)
+
+
+def recompute_stats(session: Session, since: date,
+                    tables: Iterable[str] = ("daily_stats", "hourly_stats", "minute_stats")) -> Dict[str, int]:
+    """
+    Hitung ulang tabel statistik mulai `since` dari visit_events (tanpa commit).
+    Returns jumlah baris per tabel.
+    """
+    since_dt = datetime.combine(since, datetime.min.time())
+    params = {"since": since_dt, "now": datetime.utcnow()}
+    rows: Dict[str, int] = {}
+    for table, date_column, key_columns, key_expr, per_area in _RECOMPUTE:
+        if table not in tables:
+            continue
+        session.execute(
+            text(f"DELETE FROM {table} WHERE {date_column} >= :since").bindparams(
+                bindparam("since", type_=Date if date_column == "stat_date" else DateTime)
+            ),
+            {"since": since if date_column == "stat_date" else since_dt}
+        )
+        select_sql = _RECOMPUTE_SELECT.format(
+            key=key_expr, area="area_id, " if per_area else "", group_area=", area_id" if per_area else ""
+        )
+        result = session.execute(
+            text(
+                f"INSERT INTO {table} ({key_columns}, {', '.join(STAT_FIELDS)}, last_updated_at) {select_sql}"
+            ).bindparams(bindparam("since", type_=DateTime), bindparam("now", type_=DateTime)),
+            params
+        )
+        rows[table] = result.rowcount
+    return rows
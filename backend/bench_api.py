@@ -0,0 +1,104 @@
+"""
+Load test: satu proses uvicorn (1 worker) dengan banyak request bersamaan.
+
+Menjalankan `uvicorn app.main:app` di database SQLite sementara, mengisi
+event awal lewat /api/events/ingest/batch, lalu mengirim campuran request
+dashboard/laporan (GET) dan ingest edge (POST) dengan N koneksi bersamaan
+dari asyncio (httpx). Mencetak throughput dan latensi per jenis request.
+
+Usage:
+    cd backend
+    python bench_api.py [--concurrency 200] [--requests 6000] [--seed-events 20000]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench_ingest import make_events, percentile
+
+
+async def run_load(base_url: str, args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        for i in range(0, args.seed_events, 5000):
+            r = await client.post("/api/events/ingest/batch", json=make_events(min(5000, args.seed_events - i), seed=1000 + i))
+            r.raise_for_status()
+        r = await client.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        today = time.strftime("%Y-%m-%d")
+        reads = [
+            "/api/stats/summary",
+            "/api/stats/daily",
+            f"/api/reports/events?from_date={today}&to_date={today}&limit=100",
+            f"/api/reports/csv?from_day={today}&to_day={today}",
+        ]
+        events = make_events(args.requests, seed=77)
+        latencies = {"read": [], "ingest": []}
+        errors = [0]
+        counter = iter(range(args.requests))
+
+        async def worker():
+            for i in counter:
+                kind = "ingest" if i % 5 == 0 else "read"
+                t0 = time.perf_counter()
+                try:
+                    if kind == "ingest":
+                        r = await client.post("/api/events/ingest", json=events[i])
+                    else:
+                        r = await client.get(reads[i % len(reads)], headers=headers)
+                except httpx.TransportError:
+                    errors[0] += 1
+                    continue
+                latencies[kind].append(time.perf_counter() - t0)
+                if r.status_code != 200:
+                    errors[0] += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}: {args.requests / elapsed:.0f} req/s, errors {errors[0]}")
+    for kind, values in latencies.items():
+        if values:
+            print(f"  {kind:>6}: n={len(values):<6} p50 {percentile(values, 0.5) * 1000:7.1f} ms"
+                  f"  p99 {percentile(values, 0.99) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=6000)
+    parser.add_argument("--seed-events", type=int, default=20000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix="bench-api-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(db_dir, 'bench.db')}")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+         "--workers", "1", "--timeout-keep-alive", "60", "--log-level", "warning", "--no-access-log"],
+        env=env
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        for _ in range(100):
+            try:
+                if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        asyncio.run(run_load(base_url, args))
+    finally:
+        server.terminate()
+        server.wait(timeout=15)
+
+
+if __name__ == "__main__":
+    main()
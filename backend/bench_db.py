@@ -0,0 +1,129 @@
+"""
+Benchmark: read + write bersamaan dengan profil SQLite lama vs tuned.
+
+Setiap profil dijalankan di proses terpisah dengan database sementara sendiri
+(engine dibuat saat import, jadi SQLITE_TUNED harus diset sebelum app di-load):
+- legacy: SQLITE_TUNED=false (rollback journal, satu engine untuk semua)
+- tuned:  WAL + synchronous/cache/mmap/busy_timeout + pool read-only untuk GET
+
+Writer mengirim event tunggal ke /api/events/ingest (seperti edge worker),
+reader memanggil endpoint dashboard/laporan secara bersamaan.
+
+Usage:
+    cd backend
+    python bench_db.py [--seconds 10] [--writers 4] [--readers 8] [--seed-events 20000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+def run_profile(args):
+    """Dijalankan di proses anak: env DATABASE_URL/SQLITE_TUNED sudah diset"""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    # Setelah app.main: bench_ingest mengganti DATABASE_URL saat import, tapi settings sudah terbaca
+    from bench_ingest import make_events, percentile
+
+    with TestClient(app) as client:
+        for i in range(0, args.seed_events, 5000):
+            client.post("/api/events/ingest/batch", json=make_events(min(5000, args.seed_events - i), seed=1000 + i)).raise_for_status()
+        token = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        today = time.strftime("%Y-%m-%d")
+        read_paths = [
+            "/api/stats/summary",
+            "/api/stats/daily",
+            f"/api/reports/events?from_date={today}&to_date={today}&limit=200",
+            f"/api/visitors/daily?from_date={today}&limit=200",
+        ]
+
+        stop = time.monotonic() + args.seconds
+        writes, reads, errors = [0], [0], [0]
+        read_latencies, write_latencies = [], []
+        lock = threading.Lock()
+
+        def writer(n):
+            events = make_events(100000, seed=5000 + n)
+            i = 0
+            while time.monotonic() < stop:
+                t0 = time.perf_counter()
+                r = client.post("/api/events/ingest", json=events[i % len(events)])
+                with lock:
+                    write_latencies.append(time.perf_counter() - t0)
+                    if r.status_code == 200:
+                        writes[0] += 1
+                    else:
+                        errors[0] += 1
+                i += 1
+
+        def reader(n):
+            i = n
+            while time.monotonic() < stop:
+                t0 = time.perf_counter()
+                r = client.get(read_paths[i % len(read_paths)], headers=headers)
+                with lock:
+                    read_latencies.append(time.perf_counter() - t0)
+                    if r.status_code == 200:
+                        reads[0] += 1
+                    else:
+                        errors[0] += 1
+                i += 1
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+
+    print(json.dumps({
+        "writes_per_s": writes[0] / elapsed,
+        "reads_per_s": reads[0] / elapsed,
+        "write_p99_ms": percentile(write_latencies, 0.99) * 1000 if write_latencies else 0,
+        "read_p99_ms": percentile(read_latencies, 0.99) * 1000 if read_latencies else 0,
+        "errors": errors[0],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seed-events", type=int, default=20000)
+    parser.add_argument("--profile", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        run_profile(args)
+        return
+
+    print(f"{'profile':>8} {'writes/s':>9} {'reads/s':>8} {'write p99':>10} {'read p99':>9} {'errors':>6}")
+    for profile in ("legacy", "tuned"):
+        db_dir = tempfile.mkdtemp(prefix=f"bench-db-{profile}-")
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(db_dir, 'bench.db')}",
+            SQLITE_TUNED="true" if profile == "tuned" else "false",
+        )
+        out = subprocess.run(
+            [sys.executable, __file__, "--profile", profile, "--seconds", str(args.seconds),
+             "--writers", str(args.writers), "--readers", str(args.readers), "--seed-events", str(args.seed_events)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{profile:>8} {r['writes_per_s']:>9.0f} {r['reads_per_s']:>8.0f} "
+              f"{r['write_p99_ms']:>8.1f}ms {r['read_p99_ms']:>7.1f}ms {r['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: /api/events/ingest (satu event per request) vs /api/events/ingest/batch.
+
+Menjalankan app di database SQLite sementara lewat TestClient (tanpa
+network) dan mengirim event sintetis: sebagian visitor_key berulang
+sehingga jalur "visitor sudah ada" ikut teruji. Untuk mode single juga
+dicetak latensi per request (p50/p99) dan jumlah statement SQL per event;
+mode concurrent mengirim event tunggal dari banyak thread sekaligus untuk
+melihat group commit ingest writer.
+
+Usage:
+    cd backend
+    python bench_ingest.py [--events 2000] [--batch-sizes 100,1000,5000] [--concurrency 32]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+_db_dir = tempfile.mkdtemp(prefix="bench-ingest-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.db import engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+_statements = {"insert": 0, "update": 0, "select": 0}
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    kind = statement.lstrip().split(None, 1)[0].lower()
+    if kind in _statements:
+        _statements[kind] += 1
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def make_events(n: int, seed: int):
+    rng = random.Random(seed)
+    start = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+    keys = [f"{seed:04d}-{i:08x}" for i in range(max(1, n // 3))]
+    return [{
+        "camera_id": 1,
+        "event_time": (start + timedelta(seconds=i)).isoformat(),
+        "track_id": f"t{i}",
+        "visitor_key": rng.choice(keys),
+        "direction": rng.choice(["IN", "OUT"]),
+        "confidence_avg": 0.8,
+        "client_event_id": f"{seed:04d}-ev-{i:08d}",
+    } for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--batch-sizes", default="100,1000,5000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        events = make_events(args.events, seed=1)
+        latencies = []
+        for kind in _statements:
+            _statements[kind] = 0
+        t0 = time.perf_counter()
+        for ev in events:
+            t_req = time.perf_counter()
+            r = client.post("/api/events/ingest", json=ev)
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - t_req)
+        single = time.perf_counter() - t0
+        per_event = ", ".join(f"{kind} {n / len(events):.2f}" for kind, n in _statements.items())
+        print(f"single latency ms: p50 {percentile(latencies, 0.5) * 1000:.2f}  "
+              f"p99 {percentile(latencies, 0.99) * 1000:.2f}  max {max(latencies) * 1000:.2f}")
+        print(f"single statements/event: {per_event}")
+        print(f"{'mode':>16} {'events':>7} {'seconds':>8} {'events/s':>9}")
+        print(f"{'single':>16} {len(events):>7} {single:>8.2f} {len(events) / single:>9.0f}")
+
+        events = make_events(args.events, seed=100)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            for r in pool.map(lambda ev: client.post("/api/events/ingest", json=ev), events):
+                r.raise_for_status()
+        elapsed = time.perf_counter() - t0
+        print(f"{f'single x{args.concurrency} conc':>16} {len(events):>7} {elapsed:>8.2f} {len(events) / elapsed:>9.0f}")
+
+        for seed, size in enumerate([int(s) for s in args.batch_sizes.split(",")], start=2):
+            events = make_events(max(size, args.events), seed=seed)
+            t0 = time.perf_counter()
+            for i in range(0, len(events), size):
+                r = client.post("/api/events/ingest/batch", json=events[i:i + size])
+                r.raise_for_status()
+            elapsed = time.perf_counter() - t0
+            print(f"{f'batch x{size}':>16} {len(events):>7} {elapsed:>8.2f} {len(events) / elapsed:>9.0f}")
+
+        # Replay (retry/outbox): semua client_event_id sudah ada, harus no-op
+        t0 = time.perf_counter()
+        for i in range(0, len(events), size):
+            r = client.post("/api/events/ingest/batch", json=events[i:i + size])
+            r.raise_for_status()
+            assert r.json()["duplicates"] == len(events[i:i + size])
+        elapsed = time.perf_counter() - t0
+        print(f"{f'replay x{size}':>16} {len(events):>7} {elapsed:>8.2f} {len(events) / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
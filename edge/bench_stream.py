@@ -0,0 +1,167 @@
+"""
+Benchmark: detection FPS vs jumlah viewer MJPEG.
+
+Menjalankan detection loop sintetis (blur sebagai pengganti inference,
+sedikit kerja Python sebagai pengganti tracker, lalu overlay + publish
+seperti real_loop) dengan stream server di prosesnya sendiri, dan membuka
+0/1/10/50 koneksi /video_feed dari proses terpisah.
+
+Detection FPS hanya terisolasi dari biaya viewer jika detector, stream
+server, dan proses viewer berjalan di core yang berbeda. Dengan >= 3 CPU
+(--pin auto) ketiganya di-pin lewat sched_setaffinity: detector di core
+pertama, stream server di core kedua, viewer di sisanya. Dengan CPU lebih
+sedikit, semua proses berbagi core dan penurunan detect fps sebagian besar
+adalah beban socket di sisi client; benchmark mencetak peringatan dan kolom
+`isolated` bernilai "no". Untuk angka yang representatif, jalankan di
+perangkat edge target.
+
+Per jumlah viewer: warm-up --warmup detik, lalu --rounds jendela ukur
+masing-masing --seconds detik; yang dilaporkan median (steady state) dan
+minimum detect fps.
+
+Usage:
+    cd edge
+    EDGE_STREAM_PORT=5099 python bench_stream.py [--seconds 5] [--rounds 3] [--warmup 2]
+        [--viewers 0,1,10,50] [--pin auto|on|off]
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import statistics
+import threading
+import time
+import urllib.request
+
+import cv2
+import numpy as np
+
+from core.config import EDGE_STREAM_PORT
+from core.frame_bus import (
+    start_stream_process, stop_stream_process, acquire_display_buffer, update_latest_frame
+)
+from core.visualization import draw_info_overlay
+
+
+def detection_loop(stop: threading.Event, counter: list):
+    """Loop sintetis dengan biaya mirip real_loop (tanpa model)"""
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+    while not stop.is_set():
+        cv2.GaussianBlur(frame, (31, 31), 0)         # "inference" (melepas GIL)
+        sum(i * i for i in range(20000))             # "tracker" (memegang GIL)
+        display = acquire_display_buffer(frame)
+        draw_info_overlay(display, [f"frame {counter[0]}"])
+        update_latest_frame(display, raw_frame=frame)
+        counter[0] += 1
+
+
+def viewer_process(port: int, n: int, received, ready, cpus):
+    """Buka n koneksi MJPEG dan baca terus sampai proses dihentikan"""
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    async def viewer():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /video_feed HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        await writer.drain()
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                break
+            with received.get_lock():
+                received.value += len(chunk)
+
+    async def main():
+        tasks = [asyncio.create_task(viewer()) for _ in range(n)]
+        ready.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+
+def measure(counter: list, seconds: float) -> float:
+    start_count, start = counter[0], time.monotonic()
+    time.sleep(seconds)
+    return (counter[0] - start_count) / (time.monotonic() - start)
+
+
+def plan_cpus(mode: str):
+    """
+    Bagi CPU yang tersedia: (detector, stream server, viewer). None jika
+    tidak di-pin (mode off, atau auto dengan < 3 CPU).
+    """
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    if mode == "off" or (mode == "auto" and len(cpus) < 3):
+        return None
+    if len(cpus) < 3:
+        raise SystemExit(f"--pin on butuh >= 3 CPU, tersedia {len(cpus)}")
+    return {cpus[0]}, {cpus[1]}, set(cpus[2:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--viewers', default='0,1,10,50')
+    parser.add_argument('--pin', choices=['auto', 'on', 'off'], default='auto')
+    args = parser.parse_args()
+    port = EDGE_STREAM_PORT
+
+    pinning = plan_cpus(args.pin)
+    if pinning is None:
+        print(f"[bench] WARNING: detector, stream server and viewers share {os.cpu_count()} CPU(s); "
+              f"detect fps is NOT isolated from viewer load")
+        start_stream_process()
+    else:
+        detect_cpus, stream_cpus, viewer_cpus = pinning
+        # Affinity diwarisi proses/thread baru: stream server dibuat saat
+        # proses ini di-pin ke core stream, lalu detector pindah ke core-nya
+        # sebelum thread detector dibuat.
+        os.sched_setaffinity(0, stream_cpus)
+        start_stream_process()
+        os.sched_setaffinity(0, detect_cpus)
+        print(f"[bench] pinned detector={sorted(detect_cpus)} stream={sorted(stream_cpus)} "
+              f"viewers={sorted(viewer_cpus)}")
+
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1)
+            break
+        except OSError:
+            time.sleep(0.1)
+
+    stop = threading.Event()
+    counter = [0]
+    detect_thread = threading.Thread(target=detection_loop, args=(stop, counter), daemon=True)
+    detect_thread.start()
+    time.sleep(1.0)  # warm-up
+
+    isolated = "yes" if pinning is not None else "no"
+    print(f"{'viewers':>8} {'fps median':>11} {'fps min':>8} {'MB/s out':>9} {'isolated':>9}")
+    for n in [int(v) for v in args.viewers.split(',')]:
+        received = mp.Value('q', 0)
+        ready = mp.Event()
+        proc = None
+        if n > 0:
+            cpus = pinning[2] if pinning is not None else None
+            proc = mp.Process(target=viewer_process, args=(port, n, received, ready, cpus), daemon=True)
+            proc.start()
+            ready.wait()
+        time.sleep(args.warmup)  # biarkan semua koneksi tersambung dan stabil
+        start_bytes, start = received.value, time.monotonic()
+        rates = [measure(counter, args.seconds) for _ in range(args.rounds)]
+        mbps = (received.value - start_bytes) / (time.monotonic() - start) / 1e6
+        print(f"{n:>8} {statistics.median(rates):>11.1f} {min(rates):>8.1f} {mbps:>9.1f} {isolated:>9}")
+        if proc is not None:
+            proc.terminate()
+            proc.join()
+            time.sleep(0.5)
+
+    stop.set()
+    detect_thread.join()
+    stop_stream_process()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,11 @@
 """API client for backend communication"""
 import hashlib
+import uuid
 from typing import Optional, Dict, Any, List
 import numpy as np
 import requests
 
-from .config import BACKEND_URL, AUTH_USER, AUTH_PASS, CAMERA_ID, INGEST_URL
+from .config import BACKEND_URL, AUTH_USER, AUTH_PASS, CAMERA_ID, INGEST_URL, INGEST_TIMEOUT
 
 
 def generate_visitor_key(camera_id: int, track_id: int, date_str: str) -> str:
@@ -96,14 +97,23 @@ def get_counting_areas(token: Optional[str]) -> List[Dict[str, Any]]:
     return []
 
 
-def send_visitor_event(payload: Dict[str, Any], token: Optional[str]) -> Dict[str, Any]:
-    """Send visitor event to backend"""
+def post_json(url: str, body: Any, token: Optional[str], timeout: float) -> Dict[str, Any]:
+    """POST JSON satu kali. Returns {"success", "data"/"error", "status_code"} (0 = gagal koneksi)"""
     headers = {"Authorization": f"Bearer {token}"} if token else {}
     try:
-        r = requests.post(INGEST_URL, json=payload, headers=headers, timeout=10)
-        if r.status_code == 200:
-            return {"success": True, "data": r.json(), "status_code": r.status_code}
-        else:
-            return {"success": False, "error": r.text, "status_code": r.status_code}
-    except Exception as e:
+        r = requests.post(url, json=body, headers=headers, timeout=timeout)
+    except requests.RequestException as e:
         return {"success": False, "error": str(e), "status_code": 0}
+    if r.status_code == 200:
+        return {"success": True, "data": r.json(), "status_code": r.status_code}
+    return {"success": False, "error": r.text, "status_code": r.status_code}
+
+
+def send_visitor_event(payload: Dict[str, Any], token: Optional[str], timeout: float = INGEST_TIMEOUT) -> Dict[str, Any]:
+    """
+    Send visitor event to backend (satu percobaan singkat; retry lewat EventOutbox).
+    Payload diberi `client_event_id` (sekali per event) sehingga pengiriman ulang
+    setelah timeout/koneksi putus tidak dihitung dua kali oleh backend.
+    """
+    payload.setdefault("client_event_id", uuid.uuid4().hex)
+    return post_json(INGEST_URL, payload, token, timeout)
@@ -24,6 +24,25 @@ CONFIG_REFRESH = int(env("EDGE_CONFIG_REFRESH_SECONDS", "30"))
 # Stream configuration
 EDGE_STREAM_URL = env("EDGE_STREAM_URL", "").strip()
 EDGE_STREAM_PORT = int(env("EDGE_STREAM_PORT", "5000"))
+FFMPEG_BIN = env("EDGE_FFMPEG_BIN", "ffmpeg")
+
+# Capture: resolusi target diminta di sumber (webcam / ffmpeg scale saat decode)
+# "auto" = ffmpeg untuk stream jaringan jika tersedia, "opencv", atau "ffmpeg"
+CAPTURE_BACKEND = env("EDGE_CAPTURE_BACKEND", "auto").lower()
+CAPTURE_WIDTH = int(env("EDGE_CAPTURE_WIDTH", "1280"))
+CAPTURE_HEIGHT = int(env("EDGE_CAPTURE_HEIGHT", "720"))
+# Kapasitas slot shared memory per frame (default cukup untuk 1920x1080 BGR)
+STREAM_MAX_FRAME_BYTES = int(env("EDGE_STREAM_MAX_FRAME_BYTES", str(1920 * 1080 * 3)))
+
+# Live H.264 (HLS) via ffmpeg — encoder hanya berjalan saat ada yang menonton /hls/
+HLS_ENABLED = env("EDGE_HLS_ENABLED", "1") == "1"
+HLS_MAX_WIDTH = int(env("EDGE_HLS_MAX_WIDTH", "1280"))
+HLS_FPS = int(env("EDGE_HLS_FPS", "15"))
+HLS_BITRATE = env("EDGE_HLS_BITRATE", "800k")
+HLS_SEGMENT_SECONDS = int(env("EDGE_HLS_SEGMENT_SECONDS", "1"))
+
+# Target FPS detection loop (0 = tanpa batas); sisa waktu tiap iterasi dipakai tidur
+PROCESS_FPS = float(env("EDGE_PROCESS_FPS", "15"))
 
 # YOLOv5 configuration
 CONF_TH = float(env("YOLOV5_CONF", "0.35"))
@@ -38,8 +57,16 @@ REPO = env("YOLOV5_REPO", "").strip()
 TRACK_MAX_DISAPPEARED = int(env("TRACK_MAX_DISAPPEARED", "20"))
 TRACK_MAX_DISTANCE = float(env("TRACK_MAX_DISTANCE", "80"))
 
+# Per-visitor state store (visitor_states, ReID track cache)
+STATE_TTL = float(env("EDGE_STATE_TTL_SECONDS", "120"))
+STATE_MAX_ENTRIES = int(env("EDGE_STATE_MAX_ENTRIES", "10000"))
+
 # Backend API configuration
 BACKEND_URL = env("BACKEND_URL", "http://localhost:8000")
 INGEST_URL = f"{BACKEND_URL}/api/events/ingest"
+# Satu percobaan kirim event di detection loop (detik); gagal -> outbox retry di background
+INGEST_TIMEOUT = float(env("EDGE_INGEST_TIMEOUT_SECONDS", "2"))
+# Maksimum event yang menunggu di outbox saat backend tidak bisa dihubungi
+OUTBOX_MAX = int(env("EDGE_OUTBOX_MAX", "10000"))
 AUTH_USER = env("EDGE_AUTH_USERNAME", "admin")
 AUTH_PASS = env("EDGE_AUTH_PASSWORD", "admin123")
@@ -0,0 +1,95 @@
+"""
+Sinkronisasi config kamera (stream URL + counting areas) dari backend.
+
+Berjalan di background thread: berlangganan SSE /api/edge/config/{id}/stream
+sehingga perubahan area dari admin langsung sampai, dengan fallback GET
+kondisional (If-None-Match → 304) setiap CONFIG_REFRESH detik saat SSE tidak
+tersedia. Detection loop hanya membandingkan `version` dan membangun ulang
+ROI jika berubah — tanpa request HTTP di dalam loop.
+"""
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+
+from .config import BACKEND_URL, CAMERA_ID, CONFIG_REFRESH
+
+EDGE_CONFIG_URL = f"{BACKEND_URL}/api/edge/config/{CAMERA_ID}"
+# Backend mengirim keepalive SSE tiap 15 detik; lebih lama dari ini = koneksi mati
+SSE_READ_TIMEOUT = 45.0
+
+
+class ConfigSync:
+    """Config kamera terbaru beserta versinya, diperbarui oleh background thread"""
+
+    def __init__(self, token_provider: Callable[[bool], Optional[str]]):
+        """
+        Args:
+            token_provider: fungsi(refresh) -> JWT token; refresh=True setelah 401
+        """
+        self._token_provider = token_provider
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._config: Optional[Dict[str, Any]] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="config-sync", daemon=True)
+            self._thread.start()
+
+    def current(self) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """(version, config) terbaru; (None, None) sebelum config pertama diterima"""
+        with self._lock:
+            return self._version, self._config
+
+    def _set(self, version: str, config: Dict[str, Any]):
+        with self._lock:
+            self._version, self._config = version, config
+
+    def _headers(self, refresh: bool = False) -> Dict[str, str]:
+        token = self._token_provider(refresh)
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        if self._version:
+            headers["If-None-Match"] = f'"{self._version}"'
+            headers["Last-Event-ID"] = self._version
+        return headers
+
+    def poll(self) -> bool:
+        """GET kondisional. Returns True jika config berubah."""
+        r = requests.get(EDGE_CONFIG_URL, headers=self._headers(), timeout=10)
+        if r.status_code == 401:
+            r = requests.get(EDGE_CONFIG_URL, headers=self._headers(refresh=True), timeout=10)
+        if r.status_code == 304:
+            return False
+        r.raise_for_status()
+        payload = r.json()
+        self._set(payload["version"], payload)
+        return True
+
+    def _follow_stream(self):
+        """Ikuti SSE sampai koneksi putus; setiap event `data` adalah config lengkap"""
+        with requests.get(f"{EDGE_CONFIG_URL}/stream", headers=self._headers(), stream=True,
+                          timeout=(10, SSE_READ_TIMEOUT)) as r:
+            if r.status_code == 401:
+                self._token_provider(True)
+            r.raise_for_status()
+            print("[config] Subscribed to config updates")
+            for line in r.iter_lines(decode_unicode=True):
+                if line and line.startswith("data:"):
+                    payload = json.loads(line[len("data:"):])
+                    if "version" in payload:
+                        self._set(payload["version"], payload)
+                        print(f"[config] Config updated (version {payload['version']})")
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+                self._follow_stream()
+                time.sleep(1)  # stream ditutup server; sambung ulang
+            except Exception as e:
+                print(f"[config] Config sync failed: {e}; retry in {CONFIG_REFRESH}s")
+                time.sleep(CONFIG_REFRESH)
@@ -106,6 +106,15 @@ def parse_roi(roi_data: Optional[Union[str, List]]) -> Optional[List[List[float]
     return None
 
 
+def scale_roi(roi: Optional[List[List[float]]], sx: float, sy: float) -> Optional[List[List[float]]]:
+    """Transformasi ROI ke resolusi lain (mis. dari koordinat ROI editor ke resolusi frame)"""
+    if not roi:
+        return roi
+    if sx == 1.0 and sy == 1.0:
+        return roi
+    return [[float(x) * sx, float(y) * sy] for x, y in roi]
+
+
 def point_in_roi(roi: Optional[List[List[float]]], x: float, y: float) -> bool:
     """Check if point is inside ROI polygon"""
     if not roi or len(roi) < 3:
@@ -0,0 +1,185 @@
+"""
+Frame bus: sisi detection loop dari kanal ke proses streaming server.
+
+Streaming server (JPEG encode + HTTP) berjalan di proses terpisah supaya
+tidak berebut GIL dan core dengan YOLO/DeepSORT, dan viewer yang macet tidak
+bisa memperlambat counting. Frame, metadata track dan status health dikirim
+lewat ring buffer shared memory (`ShmRing`) — tanpa pickling, tanpa pipe.
+
+Semua fungsi di sini non-blocking: jika proses streaming mati atau lambat,
+detection loop tetap berjalan dan hanya menimpa slot ring.
+"""
+import atexit
+import json
+import multiprocessing as mp
+import os
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .config import STREAM_MAX_FRAME_BYTES
+from .shm_ring import ShmRing
+from .state_store import get_store_stats
+
+RING_KINDS = ("processed", "raw", "tracks", "status")
+_SLOT_BYTES = {
+    "processed": STREAM_MAX_FRAME_BYTES,
+    "raw": STREAM_MAX_FRAME_BYTES,
+    "tracks": 256 * 1024,
+    "status": 64 * 1024,
+}
+# Status health dikirim paling sering setiap interval ini
+STATUS_INTERVAL = 0.5
+
+_rings: Dict[str, ShmRing] = {}
+_process: Optional[mp.Process] = None
+_pending_display = None  # (seq, view) slot processed yang sedang digambari
+_status: Dict[str, Any] = {}
+_last_status_time = 0.0
+_frame_count = 0
+_stream_scale: Dict[str, Any] = {}  # resolusi asli -> resolusi stream (frame oversize)
+
+
+def start_stream_process() -> mp.Process:
+    """Buat ring shared memory dan jalankan streaming server di proses terpisah"""
+    global _process
+    from .streaming import run_stream_process
+
+    prefix = f"edge{os.getpid()}"
+    names = {}
+    for kind in RING_KINDS:
+        names[kind] = f"{prefix}_{kind}"
+        _rings[kind] = ShmRing(names[kind], slot_bytes=_SLOT_BYTES[kind], create=True)
+    atexit.register(stop_stream_process)
+
+    _process = mp.Process(target=run_stream_process, args=(names,), name="edge-stream", daemon=True)
+    _process.start()
+    publish_status()
+    return _process
+
+
+def stop_stream_process():
+    """Hentikan proses streaming dan hapus segmen shared memory"""
+    global _process, _pending_display
+    if _process is not None and _process.is_alive():
+        _process.terminate()
+        _process.join(timeout=5)
+    _process = None
+    _pending_display = None
+    for ring in _rings.values():
+        try:
+            ring.close()
+        except Exception:
+            pass
+    _rings.clear()
+
+
+def has_viewers(raw: bool = False) -> bool:
+    """True jika ada client yang sedang menonton variant ini"""
+    ring = _rings.get("raw" if raw else "processed")
+    return ring is not None and ring.wanted()
+
+
+def has_track_viewers() -> bool:
+    """True jika ada client yang berlangganan metadata track (/tracks)"""
+    ring = _rings.get("tracks")
+    return ring is not None and ring.wanted()
+
+
+def raw_frame_seq() -> int:
+    """Seq raw frame terakhir yang dipublish (untuk dicocokkan dengan metadata track)"""
+    ring = _rings.get("raw")
+    return ring.write_seq if ring is not None else 0
+
+
+def acquire_display_buffer(frame: np.ndarray) -> np.ndarray:
+    """
+    Copy frame ke slot processed berikutnya di shared memory dan kembalikan view-nya.
+    Overlay digambar langsung ke slot (tidak sedang dibaca proses streaming),
+    lalu dipublish oleh `update_latest_frame()`. Ini satu-satunya copy per frame.
+    """
+    global _pending_display
+    ring = _rings.get("processed")
+    slot = ring.begin_write(frame.shape) if ring is not None else None
+    if slot is None:
+        # Frame lebih besar dari slot: overlay digambar di salinan resolusi penuh,
+        # lalu di-downscale saat dipublish (update_latest_frame)
+        return frame.copy()
+    np.copyto(slot[1], frame)
+    _pending_display = slot
+    return slot[1]
+
+
+def update_latest_frame(frame=None, raw_frame=None):
+    """Publish the latest frames to the stream process
+
+    Variant yang tidak punya viewer boleh dikirim sebagai None; frame tetap
+    dihitung untuk health check.
+
+    Args:
+        frame: Processed frame with ROI, bboxes, info overlay
+        raw_frame: Raw frame without any overlay (for ROI editor)
+    """
+    global _pending_display, _frame_count
+    if frame is not None and "processed" in _rings:
+        if _pending_display is not None and frame is _pending_display[1]:
+            _rings["processed"].commit(_pending_display[0], frame.shape)
+        else:
+            _rings["processed"].write_array(_fit_to_slot(frame))
+    _pending_display = None
+    if raw_frame is not None and "raw" in _rings:
+        _rings["raw"].write_array(_fit_to_slot(raw_frame))
+
+    _frame_count += 1
+    set_status("frame_count", _frame_count)
+    set_status("last_frame_time", time.time())
+    maybe_publish_status()
+
+
+def publish_track_metadata(metadata: Dict[str, Any]):
+    """Publish metadata track frame ini ke client SSE /tracks"""
+    ring = _rings.get("tracks")
+    if ring is not None:
+        ring.write_bytes(json.dumps(metadata, separators=(',', ':')).encode())
+
+
+def set_status(key: str, value: Any):
+    """Set field status detector yang dilaporkan oleh /health"""
+    _status[key] = value
+
+
+def publish_status():
+    """Kirim status detector (+ statistik state store) ke proses streaming"""
+    global _last_status_time
+    ring = _rings.get("status")
+    if ring is None:
+        return
+    _status["state_store"] = get_store_stats()
+    ring.write_bytes(json.dumps(_status, default=str).encode())
+    _last_status_time = time.time()
+
+
+def maybe_publish_status():
+    """publish_status() paling sering sekali per STATUS_INTERVAL"""
+    if time.time() - _last_status_time >= STATUS_INTERVAL:
+        publish_status()
+
+
+def _fit_to_slot(frame: np.ndarray) -> np.ndarray:
+    """
+    Downscale frame yang melebihi EDGE_STREAM_MAX_FRAME_BYTES (mis. kamera 4K
+    yang mengabaikan resolusi capture) supaya tetap distream. Detection tetap
+    memakai frame resolusi penuh; metadata /tracks membawa w/h aslinya.
+    """
+    if frame.nbytes <= STREAM_MAX_FRAME_BYTES:
+        return frame
+    import cv2
+    scale = (STREAM_MAX_FRAME_BYTES / frame.nbytes) ** 0.5
+    size = (max(1, int(frame.shape[1] * scale)), max(1, int(frame.shape[0] * scale)))
+    if _stream_scale.get("from") != frame.shape[:2]:
+        _stream_scale.update({"from": frame.shape[:2], "to": (size[1], size[0])})
+        print(f"[stream] Frame {frame.shape[1]}x{frame.shape[0]} exceeds EDGE_STREAM_MAX_FRAME_BYTES, "
+              f"streaming at {size[0]}x{size[1]}")
+        set_status("stream_downscaled", f"{frame.shape[1]}x{frame.shape[0]} -> {size[0]}x{size[1]}")
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
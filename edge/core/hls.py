@@ -0,0 +1,213 @@
+"""
+Live H.264 stream (HLS, segmen fragmented MP4) lewat subprocess ffmpeg.
+
+MJPEG kira-kira 10x bitrate H.264 pada kualitas yang sama, sehingga untuk
+menonton dari jauh (uplink terbatas) stream server juga menyediakan
+/hls/index.m3u8 di samping endpoint MJPEG.
+
+Encoder berjalan on-demand di proses streaming: request playlist/segmen
+menyalakan ffmpeg (libx264 ultrafast/zerolatency), dan ffmpeg dimatikan lagi
+setelah HLS_IDLE_TIMEOUT detik tanpa request. Frame diambil dari
+`FrameBroadcaster` processed dengan laju tetap HLS_FPS (frame terakhir
+diulang jika detection loop lebih lambat), sehingga timeline video mengikuti
+jam dinding.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .config import (
+    FFMPEG_BIN, HLS_BITRATE, HLS_ENABLED, HLS_FPS, HLS_MAX_WIDTH, HLS_SEGMENT_SECONDS
+)
+
+# Encoder dimatikan jika tidak ada request HLS selama ini (detik)
+HLS_IDLE_TIMEOUT = 30.0
+# Jumlah segmen di playlist live
+HLS_LIST_SIZE = 6
+PLAYLIST_NAME = "index.m3u8"
+
+
+class HlsEncoder:
+    """Satu proses ffmpeg yang meng-encode frame processed ke HLS di direktori sementara"""
+
+    def __init__(self, broadcaster):
+        """
+        Args:
+            broadcaster: FrameBroadcaster sumber frame (variant processed)
+        """
+        self.broadcaster = broadcaster
+        self.enabled = HLS_ENABLED and shutil.which(FFMPEG_BIN) is not None
+        self.directory: Optional[str] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._proc: Optional[subprocess.Popen] = None
+        self._last_request = 0.0
+        self._stats: Dict[str, Any] = {}
+        self._reset_stats()
+        if HLS_ENABLED and not self.enabled:
+            print(f"[hls] Warning: '{FFMPEG_BIN}' not found, /hls disabled")
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def touch(self) -> bool:
+        """Catat request HLS dan nyalakan encoder jika belum berjalan. Returns False jika HLS nonaktif."""
+        if not self.enabled:
+            return False
+        self._last_request = time.monotonic()
+        with self._lock:
+            if not self.running:
+                self.directory = tempfile.mkdtemp(prefix="edge-hls-")
+                self._thread = threading.Thread(target=self._run, name="hls-encoder", daemon=True)
+                self._thread.start()
+        return True
+
+    def path(self, name: str) -> Optional[str]:
+        """Path file HLS (playlist/segmen) jika ada"""
+        directory = self.directory
+        if directory is None or os.path.basename(name) != name:
+            return None
+        full = os.path.join(directory, name)
+        return full if os.path.isfile(full) else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Metrik encoder untuk /health"""
+        stats = dict(self._stats)
+        stats.update(self._segment_stats())
+        stats['enabled'] = self.enabled
+        stats['running'] = self.running
+        return stats
+
+    def _segment_stats(self) -> Dict[str, Any]:
+        """Bitrate aktual dari ukuran segmen yang sedang ada di playlist"""
+        directory = self.directory
+        sizes = []
+        if directory is not None:
+            try:
+                sizes = [e.stat().st_size for e in os.scandir(directory) if e.name.endswith('.m4s')]
+            except OSError:
+                pass
+        seconds = len(sizes) * HLS_SEGMENT_SECONDS
+        return {
+            'segments': len(sizes),
+            'bitrate_kbps': round(sum(sizes) * 8 / 1000 / seconds, 1) if seconds else 0.0,
+        }
+
+    def _reset_stats(self):
+        self._stats = {
+            'width': 0,
+            'height': 0,
+            'fps': HLS_FPS,
+            'frames_in': 0,
+            'frames_out': 0,
+            'encoder_lag_ms': 0.0,
+            'write_ms_avg': 0.0,
+            'speed': 0.0,
+            'restarts': 0,
+        }
+
+    def _command(self, width: int, height: int) -> List[str]:
+        gop = max(1, HLS_FPS * HLS_SEGMENT_SECONDS)
+        return [
+            FFMPEG_BIN, '-hide_banner', '-loglevel', 'error', '-nostats',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', str(HLS_FPS),
+            '-i', 'pipe:0',
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency',
+            '-pix_fmt', 'yuv420p', '-b:v', HLS_BITRATE, '-maxrate', HLS_BITRATE, '-bufsize', HLS_BITRATE,
+            # Keyframe tepat di setiap batas segmen
+            '-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0',
+            '-f', 'hls', '-hls_time', str(HLS_SEGMENT_SECONDS), '-hls_list_size', str(HLS_LIST_SIZE),
+            '-hls_flags', 'delete_segments+independent_segments+omit_endlist',
+            '-hls_segment_type', 'fmp4', '-hls_fmp4_init_filename', 'init.mp4',
+            '-hls_segment_filename', os.path.join(self.directory, 'seg_%05d.m4s'),
+            '-progress', 'pipe:1',
+            os.path.join(self.directory, PLAYLIST_NAME),
+        ]
+
+    def _start_ffmpeg(self, width: int, height: int):
+        self._stop_ffmpeg()
+        self._stats.update(width=width, height=height, frames_in=0, frames_out=0)
+        print(f"[hls] Starting ffmpeg encoder {width}x{height}@{HLS_FPS} ({HLS_BITRATE})")
+        self._proc = subprocess.Popen(self._command(width, height), stdin=subprocess.PIPE,
+                                      stdout=subprocess.PIPE, bufsize=0)
+        threading.Thread(target=self._read_progress, args=(self._proc,), name="hls-progress",
+                         daemon=True).start()
+
+    def _stop_ffmpeg(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=3)
+        except Exception:
+            proc.kill()
+            proc.wait()
+
+    def _read_progress(self, proc: subprocess.Popen):
+        """Parse output `-progress` ffmpeg (key=value per baris) menjadi metrik"""
+        for line in proc.stdout:
+            key, _, value = line.decode(errors='ignore').strip().partition('=')
+            try:
+                if key == 'frame':
+                    frames_out = int(value)
+                    self._stats['frames_out'] = frames_out
+                    lag = self._stats['frames_in'] - frames_out
+                    self._stats['encoder_lag_ms'] = round(max(0, lag) * 1000.0 / HLS_FPS, 1)
+                elif key == 'speed' and value.endswith('x'):
+                    self._stats['speed'] = float(value[:-1])
+            except ValueError:
+                pass
+
+    def _run(self):
+        """Thread encoder: kirim frame ke ffmpeg dengan laju HLS_FPS sampai idle"""
+        interval = 1.0 / HLS_FPS
+        last_seq = 0
+        frame: Optional[np.ndarray] = None
+        next_frame = time.monotonic()
+        write_ms = 0.0
+        try:
+            while time.monotonic() - self._last_request < HLS_IDLE_TIMEOUT:
+                self.broadcaster.keep_alive(1.0)
+                seq, latest = self.broadcaster.read_frame(last_seq, HLS_MAX_WIDTH)
+                if latest is not None:
+                    last_seq = seq
+                    # yuv420p butuh dimensi genap
+                    h, w = latest.shape[0] & ~1, latest.shape[1] & ~1
+                    frame = latest[:h, :w]
+                    if self._proc is None or (self._stats['width'], self._stats['height']) != (w, h):
+                        if self._proc is not None:
+                            self._stats['restarts'] += 1
+                        self._start_ffmpeg(w, h)
+
+                if frame is not None and self._proc is not None:
+                    start = time.perf_counter()
+                    try:
+                        self._proc.stdin.write(np.ascontiguousarray(frame).data)
+                    except (BrokenPipeError, OSError):
+                        print("[hls] ffmpeg exited, restarting")
+                        self._stats['restarts'] += 1
+                        self._start_ffmpeg(frame.shape[1], frame.shape[0])
+                        continue
+                    write_ms = 0.9 * write_ms + 0.1 * (time.perf_counter() - start) * 1000
+                    self._stats['frames_in'] += 1
+                    self._stats['write_ms_avg'] = round(write_ms, 2)
+
+                next_frame = max(next_frame + interval, time.monotonic())
+                time.sleep(max(0.0, next_frame - time.monotonic()))
+        except Exception as e:
+            print(f"[hls] Encoder error: {e}")
+        finally:
+            self._stop_ffmpeg()
+            with self._lock:
+                directory, self.directory = self.directory, None
+            if directory:
+                shutil.rmtree(directory, ignore_errors=True)
+            print("[hls] Encoder stopped (idle)")
@@ -2,25 +2,35 @@
 import time
 import random
 from datetime import datetime, timezone
-from typing import Dict, Any, List, Tuple
-import cv2
+from typing import List, Optional, Tuple
 import numpy as np
 
 from .config import (
     CAMERA_ID, POST_INTERVAL, CONFIG_REFRESH, 
-    EDGE_STREAM_URL, IMG_SIZE, TRACK_MAX_DISAPPEARED, TRACK_MAX_DISTANCE
+    EDGE_STREAM_URL, IMG_SIZE, TRACK_MAX_DISAPPEARED, TRACK_MAX_DISTANCE,
+    STATE_TTL, STATE_MAX_ENTRIES, PROCESS_FPS
 )
 from .api_client import (
-    login_token, get_camera_config, get_counting_areas,
-    generate_visitor_key, generate_visitor_key_from_embedding, send_visitor_event
+    login_token, generate_visitor_key, generate_visitor_key_from_embedding
+)
+from .config_sync import ConfigSync
+from .outbox import EventOutbox
+from .pacing import FramePacer
+from .frame_bus import (
+    update_latest_frame, acquire_display_buffer, has_viewers,
+    has_track_viewers, publish_track_metadata, raw_frame_seq, set_status, maybe_publish_status
 )
-from .streaming import update_latest_frame
 from .tracker import DeepSORTTracker, CentroidTracker, DEEPSORT_AVAILABLE
-from .detection import load_yolov5_model, parse_roi, point_in_roi
-from .visualization import draw_roi_polygon, draw_bounding_boxes, draw_info_overlay
+from .detection import load_yolov5_model, parse_roi, point_in_roi, scale_roi
+from .capture import CaptureSupervisor, CAPTURE_READ_TIMEOUT
+from .visualization import (
+    draw_roi_polygon, draw_bounding_boxes, draw_info_overlay, build_track_metadata
+)
 from .reid import update_track_embedding, get_visitor_key_for_track, cleanup_old_tracks, reset_daily_cache
+from .state_store import ExpiringStore
 
-# Standard frame resolution — must match the frontend ROI editor (NATIVE_W × NATIVE_H)
+# Ruang koordinat ROI — must match the frontend ROI editor (NATIVE_W × NATIVE_H).
+# Frame tidak di-resize ke sini; ROI yang ditransformasi ke resolusi frame.
 FRAME_W = 1280
 FRAME_H = 720
 
@@ -43,45 +53,42 @@ def real_loop():
     else:
         tracker = CentroidTracker(max_disappeared=TRACK_MAX_DISAPPEARED, max_distance=TRACK_MAX_DISTANCE)
 
-    last_cfg_fetch = 0.0
+    def get_token(refresh: bool = False) -> Optional[str]:
+        nonlocal token
+        if refresh or not token:
+            token = login_token()
+        return token
+
+    config_sync = ConfigSync(get_token)
+    config_sync.start()
+    # Event yang gagal terkirim dikirim ulang di background (loop tidak menunggu retry)
+    outbox = EventOutbox(get_token)
+    outbox.start()
+    config_version = None
+    started_at = time.time()
     roi = None
     stream_url = EDGE_STREAM_URL or ""
     area_id = None
+    # ROI dalam resolusi frame aktual, dihitung ulang saat config/resolusi berubah
+    frame_roi = None
+    roi_frame_size = None
+    logged_frame_size = None
     
     # Track visitor states untuk display (track_id -> {is_new, direction})
-    visitor_states: Dict[int, Dict[str, Any]] = {}
+    visitor_states = ExpiringStore("visitor_states", ttl=STATE_TTL, max_size=STATE_MAX_ENTRIES)
     current_date = ""
 
-    cap = None
-
-    def open_capture(url: str):
-        """
-        Open video capture.
-        Supports:
-          - Webcam index: "0", "1" → langsung buka webcam, TIDAK perlu rtsp server terpisah
-          - HTTP stream:  "http://..." → MJPEG stream dari IP camera / rtsp server
-          - RTSP stream:  "rtsp://..." → IP camera langsung
-        """
-        if url.isdigit():
-            idx = int(url)
-            print(f"[edge] Opening webcam index {idx} directly (no RTSP server needed)")
-            # Try different backends for Windows
-            for backend in [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]:
-                c = cv2.VideoCapture(idx, backend)
-                if c.isOpened():
-                    print(f"[edge] Webcam opened with backend: {backend}")
-                    c.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                    return c
-            # Fallback without backend
-            c = cv2.VideoCapture(idx)
-        else:
-            c = cv2.VideoCapture(url)
-        c.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        return c
+    # Koneksi kamera dijaga di background thread (reconnect + backoff)
+    capture = CaptureSupervisor()
+    frame_seq = 0
+    last_frame = None
+    last_offline_publish = 0.0
+    pacer = FramePacer(PROCESS_FPS)
 
     # Debounce: visitor_key -> last_event_time (prevent duplicate IN/OUT within cooldown)
-    last_event_time: Dict[str, float] = {}
+    # Entry tidak berguna lagi setelah cooldown lewat, jadi TTL = cooldown
     EVENT_COOLDOWN = 10.0  # seconds – same visitor_key won't fire again within this window
+    last_event_time = ExpiringStore("event_debounce", ttl=EVENT_COOLDOWN, max_size=STATE_MAX_ENTRIES)
 
     while True:
         now = time.time()
@@ -89,8 +96,8 @@ def real_loop():
         
         # Reset visitor states if date changed
         if today != current_date:
-            visitor_states = {}
-            last_event_time = {}
+            visitor_states.clear()
+            last_event_time.clear()
             current_date = today
             reset_daily_cache(today)  # Reset ReID embedding cache
             # Reset in_roi flag on ALL existing tracks so they fire IN for the new day
@@ -98,66 +105,88 @@ def real_loop():
                 tr.in_roi = False
             print(f"[edge] New day: {today}, reset visitor tracking + track ROI states")
 
-        # Refresh config from backend
-        if now - last_cfg_fetch > CONFIG_REFRESH or last_cfg_fetch == 0:
-            cfg = get_camera_config(token)
-            if cfg:
-                if not EDGE_STREAM_URL:
-                    stream_url = (cfg.get("stream_url") or "").strip() or stream_url
-            
-            # Get counting areas
-            areas = get_counting_areas(token)
-            if areas:
-                active_area = next((a for a in areas if a.get("is_active")), None)
-                if active_area:
-                    roi_raw = active_area.get("roi_polygon")
-                    roi = parse_roi(roi_raw)
-                    area_id = active_area.get("area_id")
-            
+        # Config dari backend hanya diterapkan saat versinya berubah
+        # (diperbarui ConfigSync lewat SSE / GET kondisional di background)
+        version, cfg = config_sync.current()
+        if cfg is not None and version != config_version:
+            config_version = version
+            if not EDGE_STREAM_URL:
+                stream_url = ((cfg.get("camera") or {}).get("stream_url") or "").strip() or stream_url
+
+            active_area = next((a for a in cfg.get("areas", []) if a.get("is_active")), None)
+            if active_area:
+                roi = parse_roi(active_area.get("roi_polygon"))
+                area_id = active_area.get("area_id")
+
             # Default ROI if not set
             if not roi:
                 roi = [[50, 50], [1230, 50], [1230, 670], [50, 670]]
-                
-            last_cfg_fetch = now
-            if roi:
-                print(f"[edge] ROI loaded: {roi}")
+
+            roi_frame_size = None  # transformasi ulang ROI pada frame berikutnya
+            print(f"[edge] Config version {version}: ROI {roi}")
             if stream_url:
                 print(f"[edge] Stream URL: {stream_url}")
+        elif roi is None and time.time() - started_at > CONFIG_REFRESH:
+            # Backend belum bisa dihubungi: pakai ROI default
+            roi = [[50, 50], [1230, 50], [1230, 670], [50, 670]]
+            roi_frame_size = None
+            print(f"[edge] Config not available yet, using default ROI {roi}")
 
         if not stream_url:
+            if config_version is None:
+                time.sleep(0.2)  # menunggu config pertama dari backend
+                continue
             print("[edge] Stream URL not set. Configure via UI or env EDGE_STREAM_URL")
             time.sleep(5)
             continue
 
-        if cap is None or not cap.isOpened():
-            cap = open_capture(stream_url)
-            if not cap.isOpened():
-                print("[edge] Failed to open stream. Retrying...")
-                try:
-                    cap.release()
-                except Exception:
-                    pass
-                cap = None
-                time.sleep(3)
-                continue
+        capture.set_url(stream_url)
+        camera_status = capture.status()
+        set_status("camera", camera_status)
 
-        ok, frame = cap.read()
-        if not ok or frame is None:
-            print("[edge] Frame read failed. Reconnecting...")
-            try:
-                cap.release()
-            except Exception:
-                pass
-            cap = None
-            time.sleep(1)
+        if roi is None:
+            # EDGE_STREAM_URL sudah ada tapi config/fallback ROI belum diterapkan:
+            # point_in_roi(None) = True, jadi menghitung sekarang memicu IN palsu
+            # untuk semua track (lalu OUT saat ROI asli datang)
+            time.sleep(0.2)
             continue
 
-        # Resize frame to standard resolution so ROI coordinates always match
-        if frame.shape[1] != FRAME_W or frame.shape[0] != FRAME_H:
-            frame = cv2.resize(frame, (FRAME_W, FRAME_H))
+        prev_seq = frame_seq
+        frame_seq, frame = capture.read(frame_seq, timeout=CAPTURE_READ_TIMEOUT)
+        if frame is None:
+            # Kamera offline / macet: loop tetap berjalan — state tetap di-expire,
+            # status dikirim ke /health dan viewer melihat frame "offline"
+            cleanup_old_tracks(now)
+            visitor_states.expire(now)
+            last_event_time.expire(now)
+            if (last_frame is not None and not capture.online and has_viewers(raw=False)
+                    and now - last_offline_publish >= 1.0):
+                display_frame = acquire_display_buffer(last_frame)
+                draw_info_overlay(display_frame, [
+                    f"CAMERA OFFLINE ({camera_status['state']})",
+                    f"Reconnect in {camera_status['retry_in']:.0f}s",
+                ], show_live_indicator=False)
+                update_latest_frame(display_frame)
+                last_offline_publish = now
+            maybe_publish_status()
+            continue
+        last_frame = frame
+        # Capture hanya menyimpan frame terbaru: frame di antaranya terlewat, tidak diantrikan
+        if prev_seq:
+            pacer.skipped(frame_seq - prev_seq - 1)
 
-        # Buat copy untuk drawing
-        display_frame = frame.copy()
+        # Frame dipakai pada resolusi capture; ROI (koordinat editor) ditransformasi
+        # ke resolusi frame hanya saat config di-refresh atau resolusi berubah
+        frame_size = (frame.shape[1], frame.shape[0])
+        if frame_size != roi_frame_size:
+            sx, sy = frame_size[0] / FRAME_W, frame_size[1] / FRAME_H
+            frame_roi = scale_roi(roi, sx, sy)
+            if hasattr(tracker, 'max_distance'):
+                tracker.max_distance = TRACK_MAX_DISTANCE * sx
+            if frame_size != logged_frame_size:
+                print(f"[edge] Frame {frame_size[0]}x{frame_size[1]}, ROI scaled x{sx:.2f}/{sy:.2f}")
+                logged_frame_size = frame_size
+            roi_frame_size = frame_size
 
         # YOLO inference
         results = model(frame, size=IMG_SIZE)
@@ -175,19 +204,21 @@ def real_loop():
         if DEEPSORT_AVAILABLE:
             tracks = tracker.update(frame, detections)
         else:
-            # Fallback: extract bboxes only for CentroidTracker
+            # Fallback: bboxes + confidences for CentroidTracker
             bboxes = [(d[0], d[1], d[2], d[3]) for d in detections]
-            tracks = tracker.update(bboxes)
+            tracks = tracker.update(bboxes, [d[4] for d in detections])
         
-        # Cleanup old tracks from ReID cache
-        cleanup_old_tracks(list(tracks.keys()))
+        # Expire per-visitor state yang sudah lama tidak terlihat
+        cleanup_old_tracks(now)
+        visitor_states.expire(now)
+        last_event_time.expire(now)
 
         # Process tracks and send events
         # Use local datetime (consistent with frontend todayISO() and backend visit_date)
         now_time = datetime.now()
         
         for tid, tr in tracks.items():
-            in_roi_now = point_in_roi(roi, tr.centroid[0], tr.centroid[1])
+            in_roi_now = point_in_roi(frame_roi, tr.centroid[0], tr.centroid[1])
             
             # Get or create visitor_key using ReID embedding (more stable)
             embedding = tr.embedding if hasattr(tr, 'embedding') else None
@@ -195,10 +226,12 @@ def real_loop():
             
             # Initialize visitor state if not exists
             if tid not in visitor_states:
-                visitor_states[tid] = {'is_new': True, 'direction': 'IN_ROI', 'visitor_key': visitor_key}
+                visitor_states.set(tid, {'is_new': True, 'direction': 'IN_ROI', 'visitor_key': visitor_key}, now)
+            else:
+                visitor_states.touch(tid, now)
             
-            # Calculate average confidence from detections
-            avg_confidence = np.mean([d[4] for d in detections]) if detections else 0.0
+            # Rata-rata confidence milik track ini (diakumulasi oleh tracker)
+            avg_confidence = tr.confidence_avg
             
             # Debounce key: visitor_key + direction
             debounce_key_in = f"{visitor_key}_IN"
@@ -218,18 +251,23 @@ def real_loop():
                         "confidence_avg": round(avg_confidence, 4)
                     }
                     
-                    result = send_visitor_event(payload, token)
+                    result = outbox.send(payload)
                     if result["success"]:
                         is_new = result["data"].get("is_new_unique", False)
                         status = "NEW" if is_new else "EXISTING"
-                        visitor_states[tid] = {'is_new': is_new, 'direction': 'IN', 'visitor_key': visitor_key}
-                        last_event_time[debounce_key_in] = now
+                        visitor_states.set(tid, {'is_new': is_new, 'direction': 'IN', 'visitor_key': visitor_key}, now)
+                        last_event_time.set(debounce_key_in, now, now)
                         print(f"[edge] Visitor IN: {visitor_key[:8]}... [{status}] -> {result['status_code']}")
+                    elif result["queued"]:
+                        # Terkirim nanti oleh outbox; status unik belum diketahui
+                        visitor_states[tid]['direction'] = 'IN'
+                        last_event_time.set(debounce_key_in, now, now)
+                        print(f"[edge] Visitor IN: {visitor_key[:8]}... queued ({outbox.pending()} pending)")
                     else:
                         print(f"[edge] Failed to send: {result.get('error', 'Unknown')}")
                 else:
                     # Debounced – still update display state
-                    visitor_states[tid] = {'is_new': False, 'direction': 'IN', 'visitor_key': visitor_key}
+                    visitor_states.set(tid, {'is_new': False, 'direction': 'IN', 'visitor_key': visitor_key}, now)
             
             # Detect ROI exit (visitor keluar)
             elif tr.in_roi and (not in_roi_now):
@@ -244,11 +282,12 @@ def real_loop():
                         "confidence_avg": round(avg_confidence, 4)
                     }
                     
-                    result = send_visitor_event(payload, token)
-                    if result["success"]:
+                    result = outbox.send(payload)
+                    if result["success"] or result["queued"]:
                         visitor_states[tid]['direction'] = 'OUT'
-                        last_event_time[debounce_key_out] = now
-                        print(f"[edge] Visitor OUT: {visitor_key[:8]}... -> {result['status_code']}")
+                        last_event_time.set(debounce_key_out, now, now)
+                        sent = result['status_code'] if result["success"] else f"queued ({outbox.pending()} pending)"
+                        print(f"[edge] Visitor OUT: {visitor_key[:8]}... -> {sent}")
                     else:
                         print(f"[edge] Failed to send: {result.get('error', 'Unknown')}")
                 else:
@@ -261,21 +300,36 @@ def real_loop():
             
             tr.in_roi = in_roi_now
         
-        # Keep a raw copy BEFORE drawing any overlays (for ROI editor)
-        raw_frame = display_frame.copy()
+        # Overlay dan raw feed hanya diproduksi untuk variant yang sedang ditonton
+        display_frame = None
+        if has_viewers(raw=False):
+            # Overlay digambar ke buffer terpisah yang tidak sedang dibaca stream server
+            display_frame = acquire_display_buffer(frame)
+
+            # Draw ROI polygon
+            draw_roi_polygon(display_frame, frame_roi)
+
+            # Draw bounding boxes dengan status
+            draw_bounding_boxes(display_frame, tracks, visitor_states)
+
+            # Draw info text
+            info_lines = [f"Tracks: {len(tracks)} | {tracker_mode}"]
+            draw_info_overlay(display_frame, info_lines)
+
+        # Frame hasil capture tidak pernah ditulis lagi, jadi dipublish apa adanya
+        # sebagai raw feed (untuk ROI editor)
+        raw_frame = frame if has_viewers(raw=True) else None
 
-        # Draw ROI polygon
-        draw_roi_polygon(display_frame, roi)
-        
-        # Draw bounding boxes dengan status
-        draw_bounding_boxes(display_frame, tracks, visitor_states)
-        
-        # Draw info text
-        info_lines = [f"Tracks: {len(tracks)} | {tracker_mode}"]
-        draw_info_overlay(display_frame, info_lines)
-        
         # Update global frame for stream server (processed + raw)
         update_latest_frame(display_frame, raw_frame=raw_frame)
 
-        # Small delay to prevent CPU overload
-        time.sleep(0.03)
+        # Metadata track untuk overlay di browser, dicocokkan dengan seq raw frame
+        if has_track_viewers():
+            publish_track_metadata(
+                build_track_metadata(tracks, visitor_states, frame_roi, frame.shape, raw_frame_seq())
+            )
+
+        # Tidur hanya sisa waktu slot (target EDGE_PROCESS_FPS)
+        set_status("pacing", pacer.stats())
+        set_status("outbox", outbox.stats())
+        pacer.wait()
@@ -0,0 +1,140 @@
+"""
+Outbox event kunjungan: retry di background, bukan di detection loop.
+
+Detection loop hanya melakukan satu percobaan POST singkat
+(EDGE_INGEST_TIMEOUT_SECONDS). Jika backend tidak bisa dihubungi atau
+membalas 5xx/429/401, event masuk antrean di memori dan thread `event-outbox`
+mengirim ulang dengan backoff eksponensial + jitter lewat
+/api/events/ingest/batch. Aman karena setiap event membawa `client_event_id`:
+event yang ternyata sudah diterima backend (timeout setelah commit) hanya
+dilaporkan sebagai duplicate.
+
+Selama antrean belum kosong, event baru langsung diantrekan (tanpa percobaan
+inline) supaya loop tidak menunggu timeout berulang kali saat backend mati dan
+urutan event tetap terjaga.
+"""
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from .api_client import post_json, send_visitor_event
+from .config import INGEST_URL, OUTBOX_MAX
+
+INGEST_BATCH_URL = f"{INGEST_URL}/batch"
+# Event per request batch (backend menerima maks INGEST_BATCH_MAX = 5000)
+OUTBOX_BATCH_MAX = 500
+# Backoff retry (detik): min * 2^(gagal-1), dibatasi max, dikali jitter 0.5–1.5
+OUTBOX_BACKOFF_MIN = 1.0
+OUTBOX_BACKOFF_MAX = 30.0
+# Timeout per request batch dari thread outbox (tidak memblokir detection loop)
+OUTBOX_TIMEOUT = 10.0
+
+
+def _retriable(status_code: int) -> bool:
+    """0 = gagal koneksi/timeout; 401 = token kedaluwarsa (login ulang)"""
+    return status_code in (0, 401, 429) or status_code >= 500
+
+
+class EventOutbox:
+    """Pengirim event dengan satu percobaan inline dan retry di background thread"""
+
+    def __init__(self, token_provider: Callable[[bool], Optional[str]]):
+        """
+        Args:
+            token_provider: fungsi(refresh) -> JWT token; refresh=True setelah 401
+        """
+        self._token_provider = token_provider
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._failures = 0
+        self._refresh_token = False  # backend membalas 401: login ulang sebelum retry
+        self.sent = 0
+        self.dropped = 0
+        self.last_error = ""
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="event-outbox", daemon=True)
+            self._thread.start()
+
+    def send(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Kirim satu event (dipanggil dari detection loop). Returns dict
+        {"success", "queued", "data", "status_code", "error"}; queued=True berarti
+        event akan dikirim ulang di background.
+        """
+        if self.pending():
+            payload.setdefault("client_event_id", uuid.uuid4().hex)
+            return self._enqueue(payload, "outbox backlog")
+        result = send_visitor_event(payload, self._token_provider(False))
+        if result["success"] or not _retriable(result["status_code"]):
+            return {**result, "queued": False}
+        return self._enqueue(payload, result["error"])
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def stats(self) -> Dict[str, Any]:
+        """Status outbox untuk /health"""
+        return {
+            "pending": self.pending(),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "failures": self._failures,
+            "last_error": self.last_error,
+        }
+
+    def _enqueue(self, payload: Dict[str, Any], error: str) -> Dict[str, Any]:
+        with self._lock:
+            if len(self._queue) >= OUTBOX_MAX:
+                self._queue.popleft()
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 1000 == 0:
+                    print(f"[edge] Outbox full ({OUTBOX_MAX}), dropped {self.dropped} oldest events")
+            self._queue.append(payload)
+        self._wake.set()
+        return {"success": False, "queued": True, "error": error, "status_code": 0}
+
+    def _backoff(self) -> float:
+        delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_MIN * (2 ** max(0, self._failures - 1)))
+        return delay * random.uniform(0.5, 1.5)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            with self._lock:
+                batch: List[Dict[str, Any]] = list(self._queue)[:OUTBOX_BATCH_MAX]
+                if not batch:
+                    self._wake.clear()
+                    continue
+            try:
+                result = post_json(INGEST_BATCH_URL, batch, self._token_provider(self._refresh_token), OUTBOX_TIMEOUT)
+            except Exception as e:  # mis. body 200 bukan JSON; thread outbox harus tetap hidup
+                result = {"success": False, "error": str(e), "status_code": 0}
+            self._refresh_token = result["status_code"] == 401
+            if result["success"] or not _retriable(result["status_code"]):
+                if result["success"]:
+                    self.sent += len(batch)
+                else:
+                    # Ditolak backend (mis. 422): tidak akan berhasil jika diulang
+                    print(f"[edge] Outbox batch of {len(batch)} rejected: {result['error'][:200]}")
+                    self.dropped += len(batch)
+                done = {e["client_event_id"] for e in batch}
+                with self._lock:
+                    # Event tertua bisa sudah dibuang _enqueue saat antrean penuh
+                    while self._queue and self._queue[0]["client_event_id"] in done:
+                        self._queue.popleft()
+                if self._failures:
+                    print(f"[edge] Backend reachable again, outbox delivered {len(batch)} events")
+                self._failures = 0
+                continue
+            self._failures += 1
+            self.last_error = f"{result['status_code']} {result['error']}"[:200]
+            time.sleep(self._backoff())
+
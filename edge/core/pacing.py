@@ -0,0 +1,78 @@
+"""
+Frame pacing untuk detection loop.
+
+Menggantikan `time.sleep(0.03)` tetap di akhir setiap iterasi: loop diberi
+jadwal tetap (deadline = awal + k × interval untuk target PROCESS_FPS), dan
+setiap iterasi hanya tidur sisa waktu sampai deadline berikutnya. Jika satu
+iterasi melewati deadline, jadwal digeser ke sekarang — slot yang terlewat
+dibuang, bukan dikejar dengan iterasi beruntun tanpa jeda. Frame yang
+terlewat tidak menumpuk karena capture hanya menyimpan frame terbaru.
+"""
+import time
+from typing import Any, Dict
+
+# Bobot EWMA untuk rata-rata waktu kerja / tidur per iterasi
+_EWMA_ALPHA = 0.1
+
+
+class FramePacer:
+    """Jadwal iterasi dengan target FPS tetap (0 = tanpa batas)"""
+
+    def __init__(self, target_fps: float):
+        self.target_fps = target_fps
+        self.interval = 1.0 / target_fps if target_fps > 0 else 0.0
+        self._next_deadline = time.monotonic()
+        self._last_wake = self._next_deadline
+        self._window_start = self._next_deadline
+        self._window_iterations = 0
+        self.busy_ms = 0.0
+        self.sleep_ms = 0.0
+        self.actual_fps = 0.0
+        self.iterations = 0
+        self.overruns = 0
+        self.frames_skipped = 0
+
+    def skipped(self, count: int):
+        """Catat frame capture yang dilewati karena loop lebih lambat dari kamera"""
+        if count > 0:
+            self.frames_skipped += count
+
+    def wait(self):
+        """Panggil di akhir iterasi: tidur sampai slot berikutnya (jika masih ada sisa waktu)"""
+        now = time.monotonic()
+        busy = now - self._last_wake
+        self.busy_ms += _EWMA_ALPHA * (busy * 1000 - self.busy_ms)
+        self.iterations += 1
+
+        delay = 0.0
+        if self.interval > 0:
+            self._next_deadline += self.interval
+            delay = self._next_deadline - now
+            if delay <= 0:
+                # Tertinggal: mulai jadwal baru dari sekarang (tanpa burst untuk mengejar)
+                self.overruns += 1
+                self._next_deadline = now
+                delay = 0.0
+            else:
+                time.sleep(delay)
+        self.sleep_ms += _EWMA_ALPHA * (delay * 1000 - self.sleep_ms)
+
+        self._last_wake = time.monotonic()
+        self._window_iterations += 1
+        elapsed = self._last_wake - self._window_start
+        if elapsed >= 2.0:
+            self.actual_fps = self._window_iterations / elapsed
+            self._window_start, self._window_iterations = self._last_wake, 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistik pacing untuk /health"""
+        return {
+            'target_fps': self.target_fps,
+            'actual_fps': round(self.actual_fps, 1),
+            'busy_ms_avg': round(self.busy_ms, 1),
+            'sleep_ms_avg': round(self.sleep_ms, 1),
+            'utilization': round(self.busy_ms / (self.interval * 1000), 2) if self.interval else None,
+            'iterations': self.iterations,
+            'overruns': self.overruns,
+            'frames_skipped': self.frames_skipped,
+        }
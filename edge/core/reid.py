@@ -3,12 +3,16 @@ ReID (Re-Identification) module untuk visitor identification
 Menggunakan deep appearance features untuk identifikasi visitor yang lebih stabil
 """
 import hashlib
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, Dict, Tuple
 import numpy as np
 
+from .config import STATE_TTL, STATE_MAX_ENTRIES
+from .state_store import ExpiringStore
+
 # Embedding cache untuk menyimpan rata-rata embedding per visitor
 # Key: track_id, Value: {'embedding': np.array, 'count': int, 'visitor_key': str}
-_embedding_cache: Dict[int, Dict[str, Any]] = {}
+# Entry kedaluwarsa STATE_TTL detik setelah track terakhir terlihat
+_embedding_cache = ExpiringStore("reid_tracks", ttl=STATE_TTL, max_size=STATE_MAX_ENTRIES)
 
 # Global registry untuk menyimpan semua embedding hari ini
 # Untuk matching visitor yang re-enter
@@ -96,6 +100,7 @@ def update_track_embedding(track_id: int, embedding: np.ndarray, camera_id: int,
     # Check if this track already exists
     if track_id in _embedding_cache:
         cache = _embedding_cache[track_id]
+        _embedding_cache.touch(track_id)
         # Update running average
         count = cache['count']
         old_emb = cache['embedding']
@@ -135,12 +140,9 @@ def get_visitor_key_for_track(track_id: int, camera_id: int, date_str: str) -> O
     return None
 
 
-def cleanup_old_tracks(active_track_ids: List[int]):
-    """Remove tracks that are no longer active from cache"""
-    global _embedding_cache
-    to_remove = [tid for tid in _embedding_cache if tid not in active_track_ids]
-    for tid in to_remove:
-        del _embedding_cache[tid]
+def cleanup_old_tracks(now: Optional[float] = None):
+    """Remove tracks that have not been seen for STATE_TTL seconds from cache"""
+    _embedding_cache.expire(now)
 
 
 def get_cache_stats() -> Dict[str, int]:
@@ -0,0 +1,162 @@
+"""
+Ring buffer di atas multiprocessing.shared_memory.
+
+Satu writer (detection loop) dan satu reader (proses streaming server).
+Data ditulis langsung ke slot shared memory — tidak ada pickling dan tidak
+ada copy lewat pipe. Setiap slot membawa nomor urut (seq) ala seqlock:
+writer menolkan seq slot sebelum menulis dan mengisinya kembali setelah
+selesai, sehingga reader bisa mendeteksi slot yang sedang/baru ditimpa
+dan membuang hasil bacaan yang robek.
+
+Header ring juga dipakai sebagai kanal balik kecil dari reader ke writer
+(`wanted` + heartbeat), supaya detection loop tahu variant mana yang
+sedang ditonton tanpa pernah menunggu proses streaming.
+"""
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+# Header ring: int64 x 8
+_H_WRITE_SEQ, _H_SLOTS, _H_SLOT_BYTES, _H_WANTED, _H_HEARTBEAT_MS = range(5)
+_HEADER_BYTES = 64
+# Header slot: int64 x 8 -> seq, nbytes, ndim, dim0, dim1, dim2
+_S_SEQ, _S_NBYTES, _S_NDIM, _S_DIM0 = 0, 1, 2, 3
+_SLOT_HEADER_BYTES = 64
+# Reader dianggap mati jika heartbeat lebih tua dari ini
+HEARTBEAT_TIMEOUT_MS = 2000
+
+
+class ShmRing:
+    """Ring buffer slot-tetap (single writer, single reader) di shared memory"""
+
+    def __init__(self, name: str, slot_bytes: int = 0, slots: int = 3, create: bool = False):
+        """
+        Args:
+            name: Nama segmen shared memory
+            slot_bytes: Kapasitas data per slot (hanya saat create)
+            slots: Jumlah slot (hanya saat create)
+            create: True di proses pemilik (writer), False untuk attach
+        """
+        self.name = name
+        self._owner = create
+        if create:
+            size = _HEADER_BYTES + slots * (_SLOT_HEADER_BYTES + slot_bytes)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            # Proses anak (mp.Process) berbagi resource_tracker dengan pemilik,
+            # jadi segmen tetap di-unlink sekali oleh writer di close()
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._header = np.ndarray((8,), dtype=np.int64, buffer=self.shm.buf, offset=0)
+        if create:
+            self._header[:] = 0
+            self._header[_H_SLOTS] = slots
+            self._header[_H_SLOT_BYTES] = slot_bytes
+        self.slots = int(self._header[_H_SLOTS])
+        self.slot_bytes = int(self._header[_H_SLOT_BYTES])
+        self._slot_meta = []
+        self._slot_data = []
+        for i in range(self.slots):
+            offset = _HEADER_BYTES + i * (_SLOT_HEADER_BYTES + self.slot_bytes)
+            self._slot_meta.append(np.ndarray((8,), dtype=np.int64, buffer=self.shm.buf, offset=offset))
+            self._slot_data.append(np.ndarray((self.slot_bytes,), dtype=np.uint8, buffer=self.shm.buf,
+                                              offset=offset + _SLOT_HEADER_BYTES))
+
+    @property
+    def write_seq(self) -> int:
+        return int(self._header[_H_WRITE_SEQ])
+
+    # ---------- writer side ----------
+
+    def begin_write(self, shape: Tuple[int, ...]) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Siapkan slot berikutnya untuk ditulis. Returns (seq, view) dengan view
+        numpy ber-shape `shape` langsung di shared memory, atau None jika data
+        melebihi kapasitas slot. Tulis ke view lalu panggil `commit(seq, shape)`.
+        """
+        nbytes = int(np.prod(shape))
+        if nbytes > self.slot_bytes:
+            return None
+        seq = self.write_seq + 1
+        meta = self._slot_meta[seq % self.slots]
+        meta[_S_SEQ] = 0  # slot sedang ditulis
+        view = self._slot_data[seq % self.slots][:nbytes].reshape(shape)
+        return seq, view
+
+    def commit(self, seq: int, shape: Tuple[int, ...]):
+        """Tandai slot `seq` selesai ditulis dan jadikan yang terbaru"""
+        meta = self._slot_meta[seq % self.slots]
+        meta[_S_NBYTES] = int(np.prod(shape))
+        meta[_S_NDIM] = len(shape)
+        meta[_S_DIM0:_S_DIM0 + len(shape)] = shape
+        meta[_S_SEQ] = seq
+        self._header[_H_WRITE_SEQ] = seq
+
+    def write_array(self, arr: np.ndarray) -> Optional[int]:
+        """Copy array uint8 ke slot berikutnya. Returns seq, atau None jika terlalu besar."""
+        slot = self.begin_write(arr.shape)
+        if slot is None:
+            return None
+        seq, view = slot
+        np.copyto(view, arr)
+        self.commit(seq, arr.shape)
+        return seq
+
+    def write_bytes(self, data: bytes) -> Optional[int]:
+        slot = self.begin_write((len(data),))
+        if slot is None:
+            return None
+        seq, view = slot
+        view[:] = np.frombuffer(data, dtype=np.uint8)
+        self.commit(seq, (len(data),))
+        return seq
+
+    def wanted(self) -> bool:
+        """True jika reader hidup dan meminta data dari ring ini"""
+        heartbeat = int(self._header[_H_HEARTBEAT_MS])
+        alive = int(time.time() * 1000) - heartbeat < HEARTBEAT_TIMEOUT_MS
+        return alive and bool(self._header[_H_WANTED])
+
+    # ---------- reader side ----------
+
+    def set_wanted(self, wanted: bool):
+        """Laporkan ke writer apakah data ring ini dibutuhkan (sekaligus heartbeat)"""
+        self._header[_H_WANTED] = 1 if wanted else 0
+        self._header[_H_HEARTBEAT_MS] = int(time.time() * 1000)
+
+    def read_latest(self, last_seq: int,
+                    alloc: Callable[[Tuple[int, ...]], np.ndarray]) -> Tuple[int, Optional[np.ndarray]]:
+        """
+        Copy slot terbaru jika seq > last_seq ke buffer dari `alloc(shape)`.
+        Returns (seq, buffer), atau (last_seq, None) jika tidak ada data baru
+        atau slot ditimpa writer selama dibaca.
+        """
+        seq = self.write_seq
+        if seq <= last_seq:
+            return last_seq, None
+        meta = self._slot_meta[seq % self.slots]
+        if int(meta[_S_SEQ]) != seq:
+            return last_seq, None
+        ndim = int(meta[_S_NDIM])
+        shape = tuple(int(d) for d in meta[_S_DIM0:_S_DIM0 + ndim])
+        nbytes = int(meta[_S_NBYTES])
+        out = alloc(shape)
+        np.copyto(out, self._slot_data[seq % self.slots][:nbytes].reshape(shape))
+        if int(meta[_S_SEQ]) != seq:
+            return last_seq, None  # robek: writer sudah mulai menimpa slot ini
+        return seq, out
+
+    def read_bytes(self, last_seq: int) -> Tuple[int, Optional[bytes]]:
+        seq, out = self.read_latest(last_seq, lambda shape: np.empty(shape, dtype=np.uint8))
+        return seq, (out.tobytes() if out is not None else None)
+
+    def close(self):
+        # Lepas view numpy dulu, kalau tidak SharedMemory.close() gagal (buffer masih diekspor)
+        self._header = None
+        self._slot_meta = []
+        self._slot_data = []
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
@@ -0,0 +1,120 @@
+"""
+Bounded per-visitor state store dengan expiry berbasis waktu.
+
+Dipakai untuk state edge yang di-key per track/visitor (visitor_states,
+debounce last_event_time, ReID embedding cache) supaya tidak tumbuh
+sepanjang hari di site yang berjalan 24/7.
+
+Setiap store punya satu TTL, sehingga entry yang diurutkan berdasarkan waktu
+akses terakhir otomatis juga terurut berdasarkan waktu kedaluwarsa. `expire()`
+cukup membuang dari kepala antrian sampai menemukan entry yang masih hidup
+(O(1) amortized), dan `max_size` memberi batas memori keras dengan membuang
+entry yang paling lama tidak disentuh.
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, Optional, Tuple
+
+# Registry semua store, untuk dilaporkan di /health
+_stores: Dict[str, "ExpiringStore"] = {}
+_stores_lock = threading.Lock()
+
+
+class ExpiringStore:
+    """Dict dengan TTL sejak akses terakhir dan ukuran maksimum"""
+
+    def __init__(self, name: str, ttl: float, max_size: int):
+        """
+        Args:
+            name: Nama store (dipakai di health metrics)
+            ttl: Detik sejak akses terakhir sebelum entry dibuang
+            max_size: Jumlah entry maksimum; entry tertua dibuang saat penuh
+        """
+        self.name = name
+        self.ttl = float(ttl)
+        self.max_size = max(1, int(max_size))
+        # key -> (touched_at, value), urut dari yang paling lama disentuh
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.expired = 0
+        self.evicted = 0
+        with _stores_lock:
+            _stores[name] = self
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self._data[key][1]
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.set(key, value)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Ambil value tanpa memperpanjang umur entry"""
+        item = self._data.get(key)
+        return item[1] if item is not None else default
+
+    def set(self, key: Hashable, value: Any, now: Optional[float] = None):
+        """Simpan value dan tandai entry sebagai baru disentuh"""
+        now = time.time() if now is None else now
+        self._data[key] = (now, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evicted += 1
+
+    def touch(self, key: Hashable, now: Optional[float] = None) -> bool:
+        """Perpanjang umur entry yang sudah ada. Returns False jika tidak ada."""
+        item = self._data.get(key)
+        if item is None:
+            return False
+        self.set(key, item[1], now)
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        return item[1] if item is not None else default
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        for key, (_, value) in self._data.items():
+            yield key, value
+
+    def clear(self):
+        self._data.clear()
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Buang entry yang tidak disentuh selama `ttl` detik. Returns jumlah yang dibuang."""
+        now = time.time() if now is None else now
+        deadline = now - self.ttl
+        removed = 0
+        while self._data:
+            touched_at, _ = next(iter(self._data.values()))
+            if touched_at > deadline:
+                break
+            self._data.popitem(last=False)
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl,
+            'expired': self.expired,
+            'evicted': self.evicted,
+        }
+
+
+def get_store_stats() -> Dict[str, Dict[str, Any]]:
+    """Statistik semua store yang terdaftar (untuk health endpoint)"""
+    with _stores_lock:
+        stores = list(_stores.values())
+    return {s.name: s.stats() for s in stores}
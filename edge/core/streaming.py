@@ -1,106 +1,637 @@
 """
-Flask streaming server for processed video feed.
+Async streaming server (Starlette + uvicorn) for processed video feed.
 
 Arsitektur:
   - Edge worker mendeteksi + tracking manusia dari kamera sumber
-  - Frame yang sudah di-overlay (bounding box, ROI, info) disimpan ke `latest_frame`
-  - Flask server menyajikan frame tersebut sebagai MJPEG stream di /video_feed
+  - Frame yang sudah di-overlay (bounding box, ROI, info) dipublish ke `FrameBroadcaster`
+  - Server menyajikan frame tersebut sebagai MJPEG stream di /video_feed
+    (tiap frame di-encode JPEG sekali, dibagikan ke semua client)
+  - Server berjalan di proses terpisah (`run_stream_process`), diberi frame oleh
+    detection loop lewat ring buffer shared memory (lihat frame_bus.py)
+  - Setiap viewer adalah coroutine di satu event loop, bukan OS thread;
+    encode JPEG berjalan di thread pool (cv2 melepas GIL saat encode)
+  - /hls/index.m3u8 menyajikan variant processed sebagai H.264 (HLS) untuk
+    menonton lewat uplink terbatas (lihat hls.py)
   - Frontend dashboard menggunakan endpoint ini untuk live preview
 
 Ini BUKAN server kamera mentah. Ini server video yang sudah diproses YOLO.
 Untuk kamera mentah (webcam), edge worker langsung membaca dari OpenCV
 tanpa perlu server terpisah (rstp_webcam_server.py).
 """
+import asyncio
+import contextlib
+import json
+import os
 import time
 import threading
-from flask import Flask, Response, jsonify
-from flask_cors import CORS
+from dataclasses import dataclass
+from typing import Optional, Tuple, List, Dict, Any
+import numpy as np
+import uvicorn
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
 
 from .config import EDGE_STREAM_PORT, EDGE_STREAM_URL
+from .hls import HlsEncoder, PLAYLIST_NAME
+from .shm_ring import ShmRing
 
-# Global variable for sharing latest frame with stream server
-latest_frame = None        # processed frame (with ROI, bboxes, info overlay)
-latest_frame_raw = None     # raw frame (no overlay) for ROI editor
-frame_lock = threading.Lock()
-_frame_count = 0
-_last_frame_time = 0.0
+JPEG_QUALITY = 80
+STREAM_MAX_FPS = 25
+# Snapshot request membuat variant tetap dipublish selama beberapa detik
+SNAPSHOT_KEEPALIVE = 10.0
+# Snapshot yang lebih tua dari ini menunggu frame baru terlebih dahulu
+SNAPSHOT_MAX_AGE = 1.0
+# Prefix ETag unik per proses, supaya seq yang mulai dari 0 lagi setelah restart tidak bentrok
+_BOOT_ID = f"{int(time.time()):x}"
+# Interval polling ring shared memory oleh feeder thread
+FEED_POLL_INTERVAL = 0.005
+# Interval komentar keepalive SSE saat tidak ada metadata baru
+TRACK_KEEPALIVE = 15.0
+# Waktu tunggu maksimum playlist HLS pertama setelah encoder dinyalakan
+HLS_STARTUP_TIMEOUT = 8.0
+_HLS_MEDIA_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4',
+}
+# Triple buffering: satu frame terpublish, satu mungkin sedang di-encode, satu untuk ditulis
+FRAME_BUFFERS = 3
 
-# Flask app for streaming
-flask_app = Flask(__name__)
-CORS(flask_app)
 
+@dataclass(frozen=True)
+class EncodeParams:
+    """Parameter encode JPEG; client dengan parameter sama berbagi hasil encode"""
+    max_width: int = 0  # 0 = resolusi asli
+    quality: int = JPEG_QUALITY
 
-def gen_frames(raw=False):
-    """Generate MJPEG stream frames from shared worker frame"""
+
+class _SeqNotifier:
+    """
+    Nomor urut (seq) yang dinaikkan dari thread detection loop dan bisa
+    ditunggu oleh coroutine di event loop server.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event: Optional[asyncio.Event] = None
+        self._seq = 0
+        self._subscribers = 0
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    @property
+    def subscribers(self) -> int:
+        """Jumlah client yang sedang terhubung"""
+        return self._subscribers
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """Hubungkan ke event loop server (dipanggil saat startup)"""
+        self._loop = loop
+        self._event = asyncio.Event()
+
+    def _wake(self):
+        """Bangunkan semua coroutine yang menunggu (berjalan di event loop)"""
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    def _notify(self):
+        """Jadwalkan _wake() dari thread mana pun"""
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._wake)
+            except RuntimeError:
+                pass  # event loop sudah ditutup
+
+    async def wait_for_seq(self, last_seq: int, timeout: float = 1.0) -> bool:
+        """Tunggu seq > last_seq. Returns False jika timeout."""
+        event = self._event
+        if self._seq > last_seq or event is None:
+            return self._seq > last_seq
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(event.wait(), timeout)
+        return self._seq > last_seq
+
+
+class FrameBroadcaster(_SeqNotifier):
+    """
+    Frame terbaru untuk satu variant stream (processed/raw).
+
+    Setiap frame baru diberi nomor urut (seq) dan di-encode JPEG paling banyak
+    sekali per `EncodeParams` — oleh client pertama yang membutuhkannya — lalu
+    bytes-nya dibagikan ke semua client dengan parameter yang sama. Client
+    (coroutine) menunggu frame baru lewat asyncio.Event yang dibangunkan dari
+    thread detection loop, sehingga tidak pernah mengirim ulang frame yang
+    sudah diterima.
+
+    Frame dipublish by reference (tanpa copy). Untuk frame yang ditulis ulang
+    tiap iterasi (salinan dari ring shared memory), gunakan `acquire_buffer()`
+    — buffer yang diberikan dijamin bukan frame terpublish terakhir dan tidak
+    sedang di-encode.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # EncodeParams -> (seq, future) encode yang sedang berjalan (hanya diakses di event loop)
+        self._inflight: Dict[EncodeParams, Tuple[int, asyncio.Future]] = {}
+        self._frame = None
+        self._published_at = 0.0
+        self._keepalive_until = 0.0  # snapshot / HLS encoder membuat variant tetap dipublish
+        # Cache encode untuk snapshot (EncodeParams default) saat tidak ada stream client
+        self._snapshot: Dict[str, Any] = {'jpeg': None, 'seq': 0, 'subscribers': 0}
+        self._encoding = None  # frame yang sedang dibaca encoder
+        self._buffers: List[np.ndarray] = []
+        self._encode_lock = threading.Lock()
+        # EncodeParams -> {'jpeg': bytes, 'seq': int, 'subscribers': int}
+        self._encoded: Dict[EncodeParams, Dict[str, Any]] = {}
+        self.encode_count = 0
+
+    @property
+    def has_frame(self) -> bool:
+        return self._frame is not None
+
+    @property
+    def wanted(self) -> bool:
+        """True jika ada stream client, snapshot baru-baru ini diminta, atau encoder HLS aktif"""
+        return self._subscribers > 0 or time.monotonic() < self._keepalive_until
+
+    def keep_alive(self, seconds: float):
+        """Minta variant ini tetap dipublish selama `seconds` detik ke depan"""
+        self._keepalive_until = max(self._keepalive_until, time.monotonic() + seconds)
+
+    def encode_variants(self) -> Dict[str, int]:
+        """Encode variant yang sedang dipakai -> jumlah client"""
+        with self._lock:
+            return {
+                f"{p.max_width or 'native'}w_q{p.quality}": v['subscribers']
+                for p, v in self._encoded.items()
+            }
+
+    def subscribe(self, params: EncodeParams) -> int:
+        """Daftarkan client baru. Returns seq saat ini (client menunggu frame setelahnya)."""
+        with self._lock:
+            self._subscribers += 1
+            variant = self._encoded.setdefault(params, {'jpeg': None, 'seq': 0, 'subscribers': 0})
+            variant['subscribers'] += 1
+            return self._seq
+
+    def unsubscribe(self, params: EncodeParams):
+        with self._lock:
+            self._subscribers = max(0, self._subscribers - 1)
+            variant = self._encoded.get(params)
+            if variant is not None:
+                variant['subscribers'] -= 1
+                if variant['subscribers'] <= 0:
+                    del self._encoded[params]
+                    if params != EncodeParams():
+                        self._inflight.pop(params, None)
+
+    def acquire_buffer(self, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """Ambil buffer preallocated yang aman ditulis (tidak sedang dibaca siapa pun)"""
+        with self._lock:
+            if self._buffers and (self._buffers[0].shape != shape or self._buffers[0].dtype != dtype):
+                self._buffers = []  # resolusi berubah
+            for buf in self._buffers:
+                if buf is not self._frame and buf is not self._encoding:
+                    return buf
+            buf = np.empty(shape, dtype=dtype)
+            if len(self._buffers) < FRAME_BUFFERS:
+                self._buffers.append(buf)
+            return buf
+
+    def publish(self, frame, seq: Optional[int] = None):
+        """
+        Simpan frame baru (by reference) dan bangunkan semua client yang menunggu.
+        Frame tidak boleh diubah lagi oleh pemanggil setelah dipublish.
+        `seq` = seq ring shared memory frame ini (naik terus, boleh melompat),
+        supaya X-Frame-Seq sama dengan `frame_seq` di metadata /tracks.
+        """
+        with self._lock:
+            self._frame = frame
+            self._seq = seq if seq is not None else self._seq + 1
+            self._published_at = time.monotonic()
+        self._notify()
+
+    async def next_jpeg(self, last_seq: int, params: EncodeParams,
+                        timeout: float = 1.0) -> Tuple[int, Optional[bytes]]:
+        """
+        Tunggu frame dengan seq > last_seq lalu kembalikan (seq, jpeg_bytes).
+        Returns (last_seq, None) jika timeout atau encode gagal.
+        """
+        if not await self.wait_for_seq(last_seq, timeout):
+            return last_seq, None
+        return await self._encode_async(last_seq, params)
+
+    async def snapshot_seq(self, timeout: float = 2.0) -> int:
+        """
+        Seq frame terbaru untuk snapshot (0 jika belum ada frame).
+        Menandai variant sebagai dibutuhkan; jika frame terakhir sudah basi
+        (variant tidak dipublish karena tidak ada viewer), tunggu frame baru.
+        """
+        self.keep_alive(SNAPSHOT_KEEPALIVE)
+        if time.monotonic() - self._published_at > SNAPSHOT_MAX_AGE:
+            await self.wait_for_seq(self._seq, timeout)
+        return self._seq if self._frame is not None else 0
+
+    async def snapshot(self) -> Tuple[int, Optional[bytes]]:
+        """JPEG frame terbaru (EncodeParams default), di-encode hanya jika ada frame baru"""
+        return await self._encode_async(0, EncodeParams())
+
+    async def _encode_async(self, last_seq: int, params: EncodeParams) -> Tuple[int, Optional[bytes]]:
+        """Encode di thread pool; coroutine lain yang butuh frame yang sama menunggu future yang sama"""
+        seq = self._seq
+        pending = self._inflight.get(params)
+        if pending is None or pending[0] < seq:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(None, self._encode_latest, last_seq, params)
+            pending = (seq, future)
+            self._inflight[params] = pending
+        return await asyncio.shield(pending[1])
+
+    def _encode_latest(self, last_seq: int, params: EncodeParams) -> Tuple[int, Optional[bytes]]:
+        import cv2
+        with self._encode_lock:
+            with self._lock:
+                seq, frame = self._seq, self._frame
+                variant = self._encoded.get(params)
+                if variant is None:
+                    variant = self._snapshot if params == EncodeParams() else {'jpeg': None, 'seq': 0}
+                # Client lain dengan parameter sama mungkin sudah meng-encode frame ini
+                if variant['seq'] >= seq:
+                    return variant['seq'], variant['jpeg']
+                self._encoding = frame
+            try:
+                img = _resize_to_width(frame, params.max_width)
+                ret, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, params.quality])
+            finally:
+                with self._lock:
+                    self._encoding = None
+            if not ret:
+                return last_seq, None
+            variant['jpeg'] = buffer.tobytes()
+            variant['seq'] = seq
+            self.encode_count += 1
+            return seq, variant['jpeg']
+
+    def read_frame(self, last_seq: int, max_width: int = 0) -> Tuple[int, Optional[np.ndarray]]:
+        """
+        Salinan (di-resize ke max_width) frame terbaru jika seq > last_seq, untuk
+        konsumen sinkron seperti encoder HLS. Returns (last_seq, None) jika tidak ada frame baru.
+        """
+        with self._encode_lock:
+            with self._lock:
+                seq, frame = self._seq, self._frame
+                if frame is None or seq <= last_seq:
+                    return last_seq, None
+                self._encoding = frame
+            try:
+                img = _resize_to_width(frame, max_width)
+                return seq, (img.copy() if img is frame else img)
+            finally:
+                with self._lock:
+                    self._encoding = None
+
+
+def _resize_to_width(frame: np.ndarray, max_width: int) -> np.ndarray:
+    """Perkecil frame ke lebar max_width (0 = resolusi asli); frame asli dikembalikan jika tidak perlu"""
     import cv2
+    if not max_width or frame.shape[1] <= max_width:
+        return frame
+    h = round(frame.shape[0] * max_width / frame.shape[1])
+    return cv2.resize(frame, (max_width, h), interpolation=cv2.INTER_AREA)
+
+
+class TrackBroadcaster(_SeqNotifier):
+    """
+    Metadata track per frame (id, bbox, status, arah) untuk overlay di browser.
+    Payload JSON sudah di-serialize oleh detection loop dan dibagikan apa adanya
+    ke semua client SSE.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._payload: Optional[bytes] = None
+
+    @property
+    def wanted(self) -> bool:
+        return self._subscribers > 0
+
+    def subscribe(self) -> int:
+        with self._lock:
+            self._subscribers += 1
+            return self._seq
+
+    def unsubscribe(self):
+        with self._lock:
+            self._subscribers = max(0, self._subscribers - 1)
+
+    def publish(self, payload: bytes):
+        with self._lock:
+            self._payload = payload
+            self._seq += 1
+        self._notify()
+
+    async def next_payload(self, last_seq: int, timeout: float = 1.0) -> Tuple[int, Optional[bytes]]:
+        """Tunggu metadata dengan seq > last_seq. Returns (last_seq, None) jika timeout."""
+        if not await self.wait_for_seq(last_seq, timeout):
+            return last_seq, None
+        with self._lock:
+            return self._seq, self._payload
+
+
+# Broadcaster per variant: processed (ROI, bboxes, info overlay) dan raw (untuk ROI editor)
+processed_broadcaster = FrameBroadcaster()
+raw_broadcaster = FrameBroadcaster()
+track_broadcaster = TrackBroadcaster()
+hls_encoder = HlsEncoder(processed_broadcaster)
+# Status terakhir dari detection loop (frame_count, last_frame_time, state_store, ...)
+_detector_status: Dict[str, Any] = {}
+
+
+
+async def gen_frames(raw=False, params: Optional[EncodeParams] = None, fps: float = STREAM_MAX_FPS):
+    """Generate MJPEG stream frames from the shared broadcaster"""
     label = "raw" if raw else "processed"
-    print(f"[stream] Client connected to video feed ({label})")
-    while True:
-        with frame_lock:
-            if raw:
-                frame = latest_frame_raw.copy() if latest_frame_raw is not None else None
-            else:
-                frame = latest_frame.copy() if latest_frame is not None else None
+    broadcaster = raw_broadcaster if raw else processed_broadcaster
+    params = params or EncodeParams()
+    interval = 1.0 / fps
+    # Frame terakhir bisa basi jika variant ini belum punya viewer,
+    # jadi tunggu frame baru yang dipublish setelah client terdaftar
+    last_seq = broadcaster.subscribe(params)
+    print(f"[stream] Client connected to video feed ({label}, {params}, fps={fps}), "
+          f"viewers={broadcaster.subscribers}")
+    try:
+        next_send = time.monotonic()
+        while True:
+            # Pacing per client: tidur hanya sisa interval sejak frame terakhir dikirim
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            seq, jpeg = await broadcaster.next_jpeg(last_seq, params)
+            if jpeg is None:
+                continue
+            last_seq = seq
+            next_send = max(next_send + interval, time.monotonic())
+
+            # X-Frame-Seq memungkinkan client mencocokkan frame dengan metadata /tracks
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n'
+                   b'X-Frame-Seq: ' + str(seq).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+    finally:
+        broadcaster.unsubscribe(params)
+        print(f"[stream] Client disconnected from video feed ({label}), viewers={broadcaster.subscribers}")
 
-        if frame is None:
-            time.sleep(0.05)
-            continue
 
-        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-        if not ret:
-            continue
+async def gen_track_events():
+    """Generate Server-Sent Events berisi metadata track per frame"""
+    last_seq = track_broadcaster.subscribe()
+    print(f"[stream] Client connected to track metadata, viewers={track_broadcaster.subscribers}")
+    try:
+        while True:
+            seq, payload = await track_broadcaster.next_payload(last_seq, timeout=TRACK_KEEPALIVE)
+            if payload is None:
+                yield b': keepalive\n\n'
+                continue
+            last_seq = seq
+            yield b'id: ' + str(seq).encode() + b'\ndata: ' + payload + b'\n\n'
+    finally:
+        track_broadcaster.unsubscribe()
+        print(f"[stream] Client disconnected from track metadata, viewers={track_broadcaster.subscribers}")
 
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
 
-        # ~25 fps max to save bandwidth
-        time.sleep(0.04)
+def _clamp_arg(request: Request, name: str, default: float, lo: float, hi: float) -> float:
+    """Ambil query parameter numerik dan batasi ke [lo, hi]"""
+    try:
+        value = float(request.query_params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    return min(max(value, lo), hi)
+
+
+def _stream_args(request: Request) -> Tuple[EncodeParams, float]:
+    """Parse ?max_width=&fps=&quality= dari request MJPEG"""
+    max_width = int(_clamp_arg(request, 'max_width', 0, 0, 3840))
+    if 0 < max_width < 160:
+        max_width = 160
+    params = EncodeParams(
+        max_width=max_width,
+        quality=int(_clamp_arg(request, 'quality', JPEG_QUALITY, 10, 95)),
+    )
+    fps = _clamp_arg(request, 'fps', STREAM_MAX_FPS, 1, STREAM_MAX_FPS)
+    return params, fps
+
+
+async def _snapshot_response(request: Request, raw: bool) -> Response:
+    """Serve frame terakhir sebagai JPEG dari cache, dengan ETag/If-None-Match"""
+    label = "raw" if raw else "processed"
+    broadcaster = raw_broadcaster if raw else processed_broadcaster
+    seq = await broadcaster.snapshot_seq()
+    if seq == 0:
+        return JSONResponse({'status': 'waiting', 'detail': 'No frame yet'}, status_code=503)
+
+    etag = f'"{_BOOT_ID}-{label}-{seq}"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status_code=304, headers=headers)
 
+    seq, jpeg = await broadcaster.snapshot()
+    if jpeg is None:
+        return JSONResponse({'status': 'error', 'detail': 'Encode failed'}, status_code=500)
+    headers['ETag'] = f'"{_BOOT_ID}-{label}-{seq}"'
+    return Response(jpeg, media_type='image/jpeg', headers=headers)
 
-@flask_app.route('/video_feed')
-def video_feed():
-    """MJPEG stream endpoint — frame sudah diproses YOLO+tracking"""
-    return Response(gen_frames(raw=False),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
+def _mjpeg_response(request: Request, raw: bool) -> StreamingResponse:
+    params, fps = _stream_args(request)
+    return StreamingResponse(gen_frames(raw=raw, params=params, fps=fps),
+                             media_type='multipart/x-mixed-replace; boundary=frame')
 
-@flask_app.route('/video_feed_raw')
-def video_feed_raw():
-    """MJPEG stream endpoint — frame TANPA overlay (untuk ROI editor)"""
-    return Response(gen_frames(raw=True),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
+
+async def video_feed(request: Request):
+    """MJPEG stream endpoint — frame sudah diproses YOLO+tracking
+
+    Query params (opsional): max_width, fps, quality
+    """
+    return _mjpeg_response(request, raw=False)
+
+
+async def video_feed_raw(request: Request):
+    """MJPEG stream endpoint — frame TANPA overlay (untuk ROI editor)
+
+    Query params (opsional): max_width, fps, quality
+    """
+    return _mjpeg_response(request, raw=True)
+
+
+async def tracks(request: Request):
+    """SSE endpoint — metadata track per frame untuk overlay di sisi browser
+
+    Tiap event: {"seq", "frame_seq", "w", "h", "roi", "tracks": [{"id", "bbox", "state", "direction"}]}
+    `frame_seq` sama dengan header X-Frame-Seq pada /video_feed_raw.
+    """
+    return StreamingResponse(gen_track_events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache'})
 
 
-@flask_app.route('/health')
-def health():
+async def snapshot(request: Request):
+    """Single JPEG frame terakhir — frame sudah diproses YOLO+tracking"""
+    return await _snapshot_response(request, raw=False)
+
+
+async def snapshot_raw(request: Request):
+    """Single JPEG frame terakhir TANPA overlay (untuk ROI editor)"""
+    return await _snapshot_response(request, raw=True)
+
+
+async def hls(request: Request):
+    """HLS (H.264, segmen fMP4) — frame sudah diproses YOLO+tracking
+
+    Buka /hls/index.m3u8 di player HLS (Safari, hls.js, VLC). Encoder ffmpeg
+    menyala saat diminta dan mati sendiri setelah tidak ada request.
+    """
+    name = request.path_params['name']
+    if not hls_encoder.touch():
+        return JSONResponse({'status': 'error', 'detail': 'HLS disabled or ffmpeg not installed'},
+                            status_code=503)
+    path = hls_encoder.path(name)
+    if path is None and name == PLAYLIST_NAME:
+        # Encoder baru dinyalakan: tunggu segmen pertama selesai
+        deadline = time.monotonic() + HLS_STARTUP_TIMEOUT
+        while path is None and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+            path = hls_encoder.path(name)
+    if path is None:
+        return JSONResponse({'status': 'waiting', 'detail': f'{name} not available'}, status_code=404)
+
+    ext = os.path.splitext(name)[1]
+    try:
+        data = await asyncio.get_running_loop().run_in_executor(None, _read_file, path)
+    except FileNotFoundError:
+        return JSONResponse({'status': 'waiting', 'detail': f'{name} not available'}, status_code=404)
+    cache = 'no-cache' if ext == '.m3u8' else 'max-age=60'
+    return Response(data, media_type=_HLS_MEDIA_TYPES.get(ext, 'application/octet-stream'),
+                    headers={'Cache-Control': cache})
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+async def health(request: Request):
     """Health check endpoint untuk frontend"""
-    global _frame_count, _last_frame_time
-    has_frame = latest_frame is not None
-    return jsonify({
-        'status': 'ok' if has_frame else 'waiting',
+    frame_count = _detector_status.get('frame_count', 0)
+    has_frame = frame_count > 0
+    camera = _detector_status.get('camera', {})
+    if camera and not camera.get('online'):
+        status = 'camera_offline'
+    else:
+        status = 'ok' if has_frame else 'waiting'
+    return JSONResponse({
+        'status': status,
         'camera_source': EDGE_STREAM_URL or 'not configured',
         'has_frame': has_frame,
         'stream_endpoint': '/video_feed',
+        'frame_count': frame_count,
+        'frame_seq': processed_broadcaster.seq,
+        'last_frame_time': _detector_status.get('last_frame_time', 0.0),
+        'viewers': {
+            'processed': processed_broadcaster.subscribers,
+            'raw': raw_broadcaster.subscribers,
+            'tracks': track_broadcaster.subscribers,
+        },
+        'jpeg_encodes': {
+            'processed': processed_broadcaster.encode_count,
+            'raw': raw_broadcaster.encode_count,
+        },
+        'encode_variants': {
+            'processed': processed_broadcaster.encode_variants(),
+            'raw': raw_broadcaster.encode_variants(),
+        },
+        'camera': camera,
+        'pacing': _detector_status.get('pacing', {}),
+        'state_store': _detector_status.get('state_store', {}),
+        'hls': hls_encoder.stats(),
     })
 
 
-def start_flask_server():
-    """Start Flask server in background thread"""
+@contextlib.asynccontextmanager
+async def _lifespan(app: Starlette):
+    loop = asyncio.get_running_loop()
+    processed_broadcaster.bind_loop(loop)
+    raw_broadcaster.bind_loop(loop)
+    track_broadcaster.bind_loop(loop)
+    yield
+
+
+stream_app = Starlette(
+    routes=[
+        Route('/video_feed', video_feed),
+        Route('/video_feed_raw', video_feed_raw),
+        Route('/tracks', tracks),
+        Route('/snapshot.jpg', snapshot),
+        Route('/snapshot_raw.jpg', snapshot_raw),
+        Route('/hls/{name}', hls),
+        Route('/health', health),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['GET'], expose_headers=['ETag']),
+    ],
+    lifespan=_lifespan,
+)
+
+
+def start_stream_server():
+    """Start async stream server (blocking; run in a background thread)"""
     print(f"[stream] Starting processed video server on http://0.0.0.0:{EDGE_STREAM_PORT}/video_feed")
-    flask_app.run(host='0.0.0.0', port=EDGE_STREAM_PORT, threaded=True, debug=False)
+    config = uvicorn.Config(stream_app, host='0.0.0.0', port=EDGE_STREAM_PORT,
+                            log_level='warning', access_log=False)
+    uvicorn.Server(config).run()
 
 
-def update_latest_frame(frame, raw_frame=None):
-    """Update the global latest frame (thread-safe)
-    
-    Args:
-        frame: Processed frame with ROI, bboxes, info overlay
-        raw_frame: Raw frame without any overlay (for ROI editor)
+def _feed_from_rings(rings: Dict[str, ShmRing]):
+    """
+    Salin data baru dari ring shared memory ke broadcaster, dan laporkan balik
+    variant mana yang sedang ditonton. Berjalan di thread proses streaming.
     """
-    global latest_frame, latest_frame_raw, _frame_count, _last_frame_time
-    with frame_lock:
-        latest_frame = frame.copy()
-        if raw_frame is not None:
-            latest_frame_raw = raw_frame.copy()
-        _frame_count += 1
-        _last_frame_time = time.time()
+    global _detector_status
+    frame_rings = ((rings['processed'], processed_broadcaster), (rings['raw'], raw_broadcaster))
+    last_seq = {ring.name: 0 for ring in rings.values()}
+    while True:
+        for ring, broadcaster in frame_rings:
+            ring.set_wanted(broadcaster.wanted)
+            seq, frame = ring.read_latest(last_seq[ring.name],
+                                          lambda shape: broadcaster.acquire_buffer(shape))
+            if frame is not None:
+                last_seq[ring.name] = seq
+                broadcaster.publish(frame, seq)
+
+        ring = rings['tracks']
+        ring.set_wanted(track_broadcaster.wanted)
+        seq, payload = ring.read_bytes(last_seq[ring.name])
+        if payload is not None:
+            last_seq[ring.name] = seq
+            track_broadcaster.publish(payload)
+
+        ring = rings['status']
+        seq, payload = ring.read_bytes(last_seq[ring.name])
+        if payload is not None:
+            last_seq[ring.name] = seq
+            _detector_status = json.loads(payload)
+
+        time.sleep(FEED_POLL_INTERVAL)
+
+
+def run_stream_process(ring_names: Dict[str, str]):
+    """Entry point proses streaming: attach ke ring shared memory lalu jalankan server"""
+    rings = {kind: ShmRing(name) for kind, name in ring_names.items()}
+    threading.Thread(target=_feed_from_rings, args=(rings,), name="stream-feeder", daemon=True).start()
+    start_stream_server()
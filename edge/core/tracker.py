@@ -24,12 +24,33 @@ class Track:
     centroid: Tuple[float, float]
     bbox: Tuple[float, float, float, float]  # x1,y1,x2,y2
     embedding: Optional[np.ndarray] = None  # ReID embedding
-    confidence: float = 0.0
+    confidence: float = 0.0  # confidence deteksi terakhir yang di-match
+    confidence_sum: float = 0.0
+    confidence_min: float = 0.0
+    confidence_count: int = 0
     disappeared: int = 0
     in_roi: bool = False
     is_new: bool = True
     last_direction: Optional[str] = None
 
+    def add_confidence(self, conf: Optional[float]):
+        """Akumulasi confidence deteksi yang di-match ke track ini (running mean/min)"""
+        if conf is None:
+            return
+        conf = float(conf)
+        self.confidence = conf
+        self.confidence_sum += conf
+        if self.confidence_count == 0 or conf < self.confidence_min:
+            self.confidence_min = conf
+        self.confidence_count += 1
+
+    @property
+    def confidence_avg(self) -> float:
+        """Rata-rata confidence deteksi milik track ini"""
+        if self.confidence_count == 0:
+            return 0.0
+        return self.confidence_sum / self.confidence_count
+
 
 class DeepSORTTracker:
     """
@@ -81,7 +102,8 @@ class DeepSORTTracker:
         if not DEEPSORT_AVAILABLE or self.tracker is None:
             # Fallback to centroid tracker
             bboxes = [(d[0], d[1], d[2], d[3]) for d in detections]
-            return self._fallback_tracker.update(bboxes)
+            confidences = [d[4] for d in detections]
+            return self._fallback_tracker.update(bboxes, confidences)
         
         if len(detections) == 0:
             # No detections - update tracker with empty list
@@ -134,6 +156,9 @@ class DeepSORTTracker:
             elif hasattr(track, 'features') and track.features is not None and len(track.features) > 0:
                 embedding = np.array(track.features[-1])
             
+            # Confidence deteksi yang di-match frame ini (None jika hanya prediksi Kalman)
+            det_conf = track.get_det_conf() if hasattr(track, 'get_det_conf') else None
+            
             # Update or create track
             if tid in self.tracks:
                 self.tracks[tid].centroid = (cx, cy)
@@ -150,6 +175,7 @@ class DeepSORTTracker:
                     confidence=0.0,
                     is_new=True
                 )
+            self.tracks[tid].add_confidence(det_conf)
         
         # Remove tracks that are no longer active
         to_remove = [tid for tid in self.tracks if tid not in active_ids]
@@ -172,8 +198,12 @@ class CentroidTrackerFallback:
         self.next_id = 1
         self.tracks: Dict[int, Track] = {}
 
-    def update(self, detections: List[Tuple[float, float, float, float]]) -> Dict[int, Track]:
-        """Update tracker with new detections"""
+    def update(
+        self,
+        detections: List[Tuple[float, float, float, float]],
+        confidences: Optional[List[float]] = None,
+    ) -> Dict[int, Track]:
+        """Update tracker with new detections (confidences sejajar dengan detections)"""
         if len(detections) == 0:
             to_del = []
             for tid, tr in self.tracks.items():
@@ -195,6 +225,8 @@ class CentroidTrackerFallback:
                 tid = self.next_id
                 self.next_id += 1
                 self.tracks[tid] = Track(tid=tid, centroid=c, bbox=bbox)
+                if confidences is not None:
+                    self.tracks[tid].add_confidence(confidences[i])
             return self.tracks
 
         track_ids = list(self.tracks.keys())
@@ -219,6 +251,8 @@ class CentroidTrackerFallback:
             self.tracks[tid].centroid = tuple(det_centroids[d_idx])
             self.tracks[tid].bbox = detections[d_idx]
             self.tracks[tid].disappeared = 0
+            if confidences is not None:
+                self.tracks[tid].add_confidence(confidences[d_idx])
 
             used_tracks.add(tid)
             used_dets.add(d_idx)
@@ -242,6 +276,8 @@ class CentroidTrackerFallback:
             tid = self.next_id
             self.next_id += 1
             self.tracks[tid] = Track(tid=tid, centroid=c, bbox=bbox)
+            if confidences is not None:
+                self.tracks[tid].add_confidence(confidences[i])
 
         return self.tracks
 
@@ -63,6 +63,38 @@ def draw_bounding_boxes(frame: np.ndarray, tracks: Dict[int, Track], visitor_sta
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
 
 
+def build_track_metadata(
+    tracks: Dict[int, Track],
+    visitor_states: Dict[int, Dict[str, Any]],
+    roi: Optional[List[List[float]]],
+    frame_shape,
+    frame_seq: int,
+) -> Dict[str, Any]:
+    """
+    Metadata overlay untuk digambar di browser (pengganti draw_roi_polygon +
+    draw_bounding_boxes). Aturan yang sama: hanya track aktif di dalam ROI.
+    Koordinat dalam resolusi frame (w × h).
+    """
+    items = []
+    for tid, tr in tracks.items():
+        if tr.disappeared > 0 or not tr.in_roi:
+            continue
+        state = visitor_states.get(tid, {})
+        items.append({
+            'id': tid,
+            'bbox': [int(v) for v in tr.bbox],
+            'state': "NEW" if state.get('is_new', True) else "EXISTING",
+            'direction': state.get('direction', 'IN_ROI'),
+        })
+    return {
+        'frame_seq': frame_seq,
+        'w': int(frame_shape[1]),
+        'h': int(frame_shape[0]),
+        'roi': roi if roi and len(roi) >= 3 else None,
+        'tracks': items,
+    }
+
+
 def draw_info_overlay(frame: np.ndarray, info_lines: List[str], show_live_indicator: bool = True):
     """Draw info text overlay on frame"""
     y_offset = 30
@@ -1,7 +1,7 @@
 "use client";
 
 import { useState, useRef, useEffect, useCallback } from "react";
-import { STREAM_URL, STREAM_RAW_URL } from "@/lib/constants";
+import { STREAM_URL } from "@/lib/constants";
 
 /**
  * Default canvas size (matches typical YOLO frame: 1280×720).
@@ -10,9 +10,12 @@ import { STREAM_URL, STREAM_RAW_URL } from "@/lib/constants";
 const NATIVE_W = 1280;
 const NATIVE_H = 720;
 
+/** How often the background snapshot is refreshed (ms). */
+const SNAPSHOT_INTERVAL = 3000;
+
 /**
  * Interactive ROI polygon editor.
- * – Live camera MJPEG feed as background
+ * – Live camera snapshot (refreshed periodically) as background
  * – Click to add points
  * – Drag points to reposition
  * – Right‑click / double‑click a point to delete it
@@ -88,19 +91,50 @@ export default function RoiEditor({ points = [], onChange }) {
     return () => clearInterval(timer);
   }, []);
 
-  /* ───────── MJPEG image loader ───────── */
-  // Use a hidden <img> element — the browser handles MJPEG multipart
-  // streams natively without needing periodic src refreshes.
-  const hiddenImgRef = useRef(null);
-
+  /* ───────── Snapshot image loader ───────── */
+  // The editor only needs a still frame, so poll the edge's cached raw
+  // snapshot instead of holding an MJPEG stream open. The browser sends
+  // If-None-Match for us; an unchanged frame comes back as 304 and the
+  // image is only swapped when the ETag changes.
   useEffect(() => {
-    if (!streamOk || !hiddenImgRef.current) return;
-    const img = hiddenImgRef.current;
-    // Use raw feed (no overlay) so only the editor's polygon is visible
-    img.src = STREAM_RAW_URL;
-    imgRef.current = img;
+    if (!streamOk) return;
+    const snapshotUrl = STREAM_URL.replace(/\/video_feed$/, "/snapshot_raw.jpg");
+    let etag = null;
+    let objectUrl = null;
+    let cancelled = false;
+
+    const load = async () => {
+      try {
+        const r = await fetch(snapshotUrl, { cache: "no-cache" });
+        if (!r.ok || cancelled) return;
+        const tag = r.headers.get("ETag");
+        if (tag && tag === etag) return;
+        const blob = await r.blob();
+        if (cancelled) return;
+        const img = new Image();
+        const url = URL.createObjectURL(blob);
+        img.onload = () => {
+          if (cancelled) {
+            URL.revokeObjectURL(url);
+            return;
+          }
+          if (objectUrl) URL.revokeObjectURL(objectUrl);
+          objectUrl = url;
+          etag = tag;
+          imgRef.current = img;
+        };
+        img.src = url;
+      } catch {
+        // Health check will flip streamOk if the edge is gone
+      }
+    };
+
+    load();
+    const timer = setInterval(load, SNAPSHOT_INTERVAL);
     return () => {
-      img.src = "";
+      cancelled = true;
+      clearInterval(timer);
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
       imgRef.current = null;
     };
   }, [streamOk]);
@@ -457,15 +491,6 @@ export default function RoiEditor({ points = [], onChange }) {
 
   return (
     <div className="space-y-3">
-      {/* Hidden img for MJPEG stream — browser decodes multipart natively */}
-      {/* eslint-disable-next-line @next/next/no-img-element */}
-      <img
-        ref={hiddenImgRef}
-        alt=""
-        style={{ display: "none" }}
-        crossOrigin="anonymous"
-      />
-
       {/* Toolbar */}
       <div className="flex flex-wrap gap-2 items-center">
         <span className="text-sm font-semibold opacity-70 mr-1">Preset:</span>
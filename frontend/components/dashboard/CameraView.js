@@ -6,13 +6,67 @@ import Button from "@/components/ui/Button";
 import Alert from "@/components/ui/Alert";
 import Section from "@/components/ui/Section";
 
+// Dashboard preview is a thumbnail — ask the edge for a smaller, lighter stream.
+// Overlays are drawn here from /tracks metadata, so only the raw feed is encoded.
+const PREVIEW_STREAM_URL = `${STREAM_URL.replace(/\/video_feed$/, "/video_feed_raw")}?max_width=640&fps=12&quality=70`;
+const TRACKS_URL = STREAM_URL.replace(/\/video_feed$/, "/tracks");
+
+// Same colours as the edge's draw_roi_polygon / draw_bounding_boxes
+const ROI_COLOR = "rgb(0, 255, 255)";
+const STATE_COLORS = { NEW: "rgb(0, 255, 0)", EXISTING: "rgb(0, 165, 255)" };
+
+/**
+ * Draw ROI polygon and track boxes from one /tracks event onto the canvas.
+ * Coordinates arrive in frame resolution (meta.w × meta.h).
+ */
+function drawOverlay(canvas, meta) {
+  const ctx = canvas.getContext("2d");
+  const w = canvas.clientWidth;
+  const h = canvas.clientHeight;
+  if (canvas.width !== w || canvas.height !== h) {
+    canvas.width = w;
+    canvas.height = h;
+  }
+  ctx.clearRect(0, 0, w, h);
+  if (!meta || !meta.w || !meta.h) return;
+  const sx = w / meta.w;
+  const sy = h / meta.h;
+
+  if (meta.roi) {
+    ctx.strokeStyle = ROI_COLOR;
+    ctx.lineWidth = 2;
+    ctx.beginPath();
+    meta.roi.forEach(([x, y], i) => (i === 0 ? ctx.moveTo(x * sx, y * sy) : ctx.lineTo(x * sx, y * sy)));
+    ctx.closePath();
+    ctx.stroke();
+  }
+
+  ctx.font = "11px sans-serif";
+  for (const t of meta.tracks) {
+    const [x1, y1, x2, y2] = t.bbox;
+    const color = STATE_COLORS[t.state] || STATE_COLORS.NEW;
+    ctx.strokeStyle = color;
+    ctx.lineWidth = 2;
+    ctx.strokeRect(x1 * sx, y1 * sy, (x2 - x1) * sx, (y2 - y1) * sy);
+
+    const label = `ID:${t.id} ${t.state}${t.direction ? ` [${t.direction}]` : ""}`;
+    const tw = ctx.measureText(label).width;
+    ctx.fillStyle = color;
+    ctx.fillRect(x1 * sx, y1 * sy - 16, tw + 8, 16);
+    ctx.fillStyle = "#fff";
+    ctx.fillText(label, x1 * sx + 4, y1 * sy - 4);
+  }
+}
+
 /**
  * Live camera MJPEG stream viewer with health-check.
+ * Track overlays are rendered client-side from the edge's /tracks SSE stream.
  */
 export default function CameraView() {
   const [error, setError] = useState("");
   const [loading, setLoading] = useState(true);
   const imgRef = useRef(null);
+  const canvasRef = useRef(null);
 
   const healthUrl = STREAM_URL.replace(/\/video_feed$/, "/health");
 
@@ -25,6 +79,13 @@ export default function CameraView() {
           if (data.status === "ok") {
             setLoading(false);
             setError("");
+          } else if (data.status === "camera_offline") {
+            // Edge worker hidup tapi kamera putus; supervisor menyambung ulang sendiri
+            const retry = data.camera?.retry_in;
+            setError(
+              `Kamera offline, edge worker mencoba menyambung ulang${retry ? ` (${Math.ceil(retry)} detik lagi)` : ""}.`
+            );
+            setLoading(false);
           } else {
             throw new Error("Edge worker belum menerima frame dari kamera.");
           }
@@ -42,6 +103,20 @@ export default function CameraView() {
     return () => clearInterval(interval);
   }, [healthUrl]);
 
+  useEffect(() => {
+    if (loading || error) return;
+    const source = new EventSource(TRACKS_URL);
+    source.onmessage = (e) => {
+      if (!canvasRef.current) return;
+      try {
+        drawOverlay(canvasRef.current, JSON.parse(e.data));
+      } catch {
+        // Ignore malformed events; the next frame will redraw
+      }
+    };
+    return () => source.close();
+  }, [loading, error]);
+
   const handleImageError = () => {
     setError("Failed to load camera stream. Kamera mungkin busy atau disconnected.");
     setLoading(false);
@@ -56,7 +131,7 @@ export default function CameraView() {
     setError("");
     setLoading(true);
     if (imgRef.current) {
-      imgRef.current.src = STREAM_URL + "?t=" + Date.now();
+      imgRef.current.src = PREVIEW_STREAM_URL + "&t=" + Date.now();
     }
   };
 
@@ -80,14 +155,17 @@ export default function CameraView() {
         </Alert>
       )}
 
-      <img
-        ref={imgRef}
-        src={STREAM_URL}
-        alt="Camera Feed"
-        onError={handleImageError}
-        onLoad={handleImageLoad}
-        className={`w-full  rounded-lg bg-black ${loading || error ? "hidden" : "block"}`}
-      />
+      <div className={`relative ${loading || error ? "hidden" : "block"}`}>
+        <img
+          ref={imgRef}
+          src={PREVIEW_STREAM_URL}
+          alt="Camera Feed"
+          onError={handleImageError}
+          onLoad={handleImageLoad}
+          className="w-full rounded-lg bg-black"
+        />
+        <canvas ref={canvasRef} className="absolute inset-0 w-full h-full pointer-events-none" />
+      </div>
 
       {!loading && !error && (
         <p className="text-xs opacity-60 mt-2">